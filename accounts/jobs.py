@@ -0,0 +1,11 @@
+from accounts.models import User
+from accounts.signals import user_signed_up
+from backend.jobs import job
+
+
+@job("accounts.signup")
+def signup_hooks(user_id):
+
+    #notification hooks run in the worker, off the signup request
+    user = User.all_objects.get(pk=user_id)
+    user_signed_up.send(sender=User, user=user)
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 21:04
+
+import accounts.models
+import backend.tenancy
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_user_id'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', accounts.models.TenantUserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='tenant',
+            field=models.CharField(default=backend.tenancy.get_current_tenant, editable=False, max_length=63),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['tenant', 'email'], name='user_tenant_email_idx'),
+        ),
+    ]
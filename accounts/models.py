@@ -1,27 +1,40 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, UserManager
-from backend.models import SoftDeleteManager, SoftDeleteModel
+from backend.ids import next_codes
+from backend.models import SoftDeleteManager, SoftDeleteModel, TenantModel, TenantScopedMixin
 import uuid
 
 
-class User(SoftDeleteModel, AbstractUser):
+class TenantUserManager(TenantScopedMixin, UserManager):
+    pass
+
+
+class User(TenantModel, SoftDeleteModel, AbstractUser):
    
     user_id = models.CharField(max_length=30, unique=True, editable=False, null=True)
-    email = models.EmailField(unique=True)
+    #unique per tenant, see Meta
+    username = models.CharField(max_length=150, validators=[AbstractUser.username_validator])
+    email = models.EmailField()
     full_name = models.CharField(max_length=255, blank=True)
     session_token = models.UUIDField(default=uuid.uuid4, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]  
 
-    objects = UserManager()
+    #login and token lookups only see the current tenant's users
+    objects = TenantUserManager()
     all_objects = models.Manager()
 
+    class Meta:
+        #tenants sharing a database may each have the same address
+        constraints = [
+            models.UniqueConstraint(fields=["tenant", "email"], name="user_tenant_email_uniq"),
+            models.UniqueConstraint(fields=["tenant", "username"], name="user_tenant_username_uniq"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.user_id:
-            last = User.all_objects.order_by("id").last()
-            next_id = 1 if not last else last.id + 1
-            self.user_id = f"USR{next_id}"
+            self.user_id = next_codes(User.all_objects, "user_id", "USR")[0]
         super().save(*args, **kwargs)
         
     def __str__(self):
@@ -9,14 +9,18 @@ class SignupSerializer(serializers.ModelSerializer):
         model = User
         fields = ["email", "username", "password", "full_name"]
 
+    #unique per tenant: User.objects only sees the current tenant, other tenants'
+    #users are neither a conflict nor to be revealed
     def validate_email(self, value):
-        if User.all_objects.filter(email=value).exists():
+        if User.objects.filter(email=value).exists():
             raise serializers.ValidationError("Email already exists")
         return value
 
+    def validate_username(self, value):
+        if User.objects.filter(username=value).exists():
+            raise serializers.ValidationError("A user with that username already exists.")
+        return value
+
     def create(self, validated_data):
-        password = validated_data.pop("password")
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        #create_user hashes the password, one hash and one INSERT
+        return User.objects.create_user(**validated_data)
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+
+#sent from the "accounts.signup" background job, kwargs: user
+user_signed_up = Signal()
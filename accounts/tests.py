@@ -1,3 +1,67 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from accounts.signals import user_signed_up
+from backend.jobs import run_pending
+from backend.models import Job
+from backend.throttling import reset_buckets
+from rbac.models import Role, UserRole
+
+
+class SignupTestCase(TestCase):
+
+    def setUp(self):
+        self.role = Role.objects.create(name="User")
+        reset_buckets()
+
+    def signup(self, name):
+        return self.client.post("/api/accounts/signup/", {
+            "email": f"{name}@test.com",
+            "username": name,
+            "password": "secret123"
+        })
+
+    def test_signup_hashes_once_and_assigns_default_role(self):
+        with mock.patch("django.contrib.auth.models.make_password", wraps=make_password) as hasher:
+            res = self.signup("alice")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(hasher.call_count, 1)
+
+        user = User.objects.get(email="alice@test.com")
+        self.assertTrue(user.check_password("secret123"))
+        self.assertTrue(UserRole.objects.filter(user=user, role=self.role).exists())
+
+    def test_default_role_lookup_is_cached(self):
+        self.signup("alice")
+        with self.assertNumQueries(6):
+            #email + username checks, savepoint pair, user and role inserts
+            self.signup("bob")
+
+    def test_no_job_without_hooks(self):
+        self.assertEqual(self.signup("alice").status_code, 201)
+        self.assertFalse(Job.objects.exists())
+
+    def test_signup_hooks_run_in_worker(self):
+        received = []
+        user_signed_up.connect(lambda sender, user, **kwargs: received.append(user.email), weak=False, dispatch_uid="test")
+        self.addCleanup(user_signed_up.disconnect, dispatch_uid="test")
+
+        self.signup("alice")
+        self.assertEqual(received, [])
+        self.assertEqual(Job.objects.get().name, "accounts.signup")
+
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(received, ["alice@test.com"])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(THROTTLE_RATES={"signup": {"ip": "2/min"}})
+    def test_signup_throttled_per_address(self):
+        self.assertEqual(self.signup("alice").status_code, 201)
+        self.assertEqual(self.signup("bob").status_code, 201)
+        with self.assertNumQueries(0):
+            res = self.signup("carol")
+        self.assertEqual(res.status_code, 429)
+        self.assertFalse(User.objects.filter(email="carol@test.com").exists())
@@ -1,23 +1,36 @@
+from django.db import transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from accounts.models import User
 from accounts.serializers import SignupSerializer
-from rbac.models import Role, UserRole
+from accounts.signals import user_signed_up
+from backend.jobs import enqueue
+from backend.metrics import timed
+from backend.tenancy import tenant_db
+from rbac.models import UserRole
+from rbac.services import get_role_id
 
 
 class SignupAPIView(APIView):
     authentication_classes = []
     permission_classes = []
+    throttle_scope = "signup"
 
     def post(self, request):
 
-        serializer = SignupSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        with timed("serializer"):
+            serializer = SignupSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
 
-        role = Role.objects.get(name="User")
-        UserRole.objects.create(user=user, role=role)
+        with transaction.atomic(using=tenant_db()):
+            user = serializer.save()
+            UserRole.objects.create(user=user, role_id=get_role_id())
+            #side effects run in the worker (python manage.py run_jobs), only
+            #queued when something listens for user_signed_up
+            if user_signed_up.has_listeners(User):
+                enqueue("accounts.signup", user_id=user.pk)
 
         return Response({
             "message": "User registered successfully",
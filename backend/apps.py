@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class BackendConfig(AppConfig):
+    name = 'backend'
+
+    def ready(self):
+        from backend import checks, pooling  # noqa: F401
+
+        #registers the @job handlers in every app's jobs.py
+        autodiscover_modules("jobs")
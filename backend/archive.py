@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import connections, transaction
+from django.utils import timezone
+
+from backend.models import ArchivedRow, SoftDeleteModel
+from backend.tenancy import tenant_db
+
+
+def retention_days():
+    return getattr(settings, "ARCHIVE_RETENTION_DAYS", 90)
+
+
+def archive_order(models):
+
+    #rows that reference a model are archived before the model itself
+    ordered, seen = [], set()
+
+    def visit(model):
+        if model in seen:
+            return
+        seen.add(model)
+        for rel in model._meta.related_objects:
+            if rel.related_model in models:
+                visit(rel.related_model)
+        ordered.append(model)
+
+    for model in models:
+        visit(model)
+    return ordered
+
+
+def archivable_models():
+    return archive_order([
+        model for model in apps.get_models()
+        if issubclass(model, SoftDeleteModel) and not model._meta.proxy
+    ])
+
+
+def candidates(model, cutoff):
+
+    #only rows nothing points at, so the delete never cascades into live data,
+    #derived tables (archive_cascade = True) are rebuilt on demand and don't count
+    queryset = model._base_manager.filter(is_deleted=True, deleted_at__lt=cutoff)
+    for rel in model._meta.related_objects:
+        if getattr(rel.related_model, "archive_cascade", False):
+            continue
+        queryset = queryset.filter(**{f"{rel.name}__isnull": True})
+    return queryset.order_by("pk")
+
+
+def lock_candidates(queryset):
+    features = connections[tenant_db()].features
+    if not features.has_select_for_update:
+        return queryset
+
+    options = {}
+    if features.has_select_for_update_skip_locked:
+        options["skip_locked"] = True
+    if features.has_select_for_update_of:
+        options["of"] = ("self",)
+    return queryset.select_for_update(**options)
+
+
+def archive_batch(model, cutoff, batch_size):
+
+    #one short transaction per batch
+    with transaction.atomic(using=tenant_db()):
+        pks = list(lock_candidates(candidates(model, cutoff)).values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return 0
+
+        rows = model._base_manager.filter(pk__in=pks).prefetch_related(
+            *[field.name for field in model._meta.many_to_many]
+        )
+        label = model._meta.label_lower
+        archived = [
+            ArchivedRow(
+                model=label,
+                object_pk=str(document["pk"]),
+                payload=document,
+                deleted_at=document["fields"]["deleted_at"]
+            )
+            for document in serializers.serialize("python", rows)
+        ]
+        ArchivedRow.objects.bulk_create(archived, batch_size=batch_size)
+        model._base_manager.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def archive_deleted(days=None, batch_size=None, models=None, sleep=0, log=None):
+
+    days = retention_days() if days is None else days
+    batch_size = batch_size or getattr(settings, "ARCHIVE_BATCH_SIZE", 500)
+    cutoff = timezone.now() - timedelta(days=days)
+
+    counts = {}
+    for model in models or archivable_models():
+        total = 0
+        while True:
+            archived = archive_batch(model, cutoff, batch_size)
+            total += archived
+            if archived < batch_size:
+                break
+            if sleep:
+                time.sleep(sleep)
+        counts[model._meta.label] = total
+        if log:
+            log(f"{model._meta.label}: archived {total}")
+    return counts
+
+
+def pending_counts(days=None, models=None):
+    days = retention_days() if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return {model._meta.label: candidates(model, cutoff).count() for model in models or archivable_models()}
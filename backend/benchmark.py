@@ -0,0 +1,154 @@
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from backend.seeding import WORDS
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, queries, errors, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+    }
+
+
+class ClientTransport:
+
+    #in-process django test client, counts queries per request
+    counts_queries = True
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        call = getattr(self.client, method.lower())
+        with CaptureQueriesContext(connection) as ctx:
+            if body is None:
+                response = call(path, **headers)
+            else:
+                response = call(path, data=json.dumps(body), content_type="application/json", **headers)
+        return response.status_code, json.loads(response.content or b"null"), len(ctx.captured_queries)
+
+
+class HTTPTransport:
+
+    #a running server, e.g. gunicorn backend.wsgi
+    counts_queries = False
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body=None, token=None):
+        request = urllib.request.Request(self.base_url + path, method=method)
+        if token:
+            request.add_header("Authorization", f"Bearer {token}")
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            request.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(request, data=data) as response:
+                return response.status, json.loads(response.read() or b"null"), None
+        except urllib.error.HTTPError as exc:
+            return exc.code, None, None
+
+
+class Benchmark:
+
+    scenarios = ["list", "list_cursor", "search", "detail", "create", "signup"]
+
+    def __init__(self, transport, email, password, seed=None):
+        self.transport = transport
+        self.rng = random.Random(seed)
+        self.email = email
+        self.password = password
+        self.token = None
+        self.task_ids = []
+
+    def login(self):
+        status, data, _ = self.transport.request("POST", "/api/auth/token/", {"email": self.email, "password": self.password})
+        if status != 200:
+            raise RuntimeError(f"Login as {self.email} failed with {status}")
+        self.token = data["access"]
+
+        status, data, _ = self.transport.request("GET", "/api/tasks/task/?limit=100", token=self.token)
+        self.task_ids = [task["task_id"] for task in (data or {}).get("results", [])]
+
+    def next_request(self, scenario):
+        if scenario == "list":
+            return "GET", f"/api/tasks/task/?limit=20&page={self.rng.randint(1, 5)}", None, self.token
+        if scenario == "list_cursor":
+            return "GET", "/api/tasks/task/?pagination=cursor&limit=20", None, self.token
+        if scenario == "search":
+            return "GET", f"/api/tasks/task/?search={self.rng.choice(WORDS)}&limit=20", None, self.token
+        if scenario == "detail":
+            return "GET", f"/api/tasks/{self.rng.choice(self.task_ids)}/", None, self.token
+        if scenario == "create":
+            return "POST", "/api/tasks/task/", {"title": f"bench {self.rng.choice(WORDS)}"}, self.token
+        if scenario == "signup":
+            name = f"bench-{uuid.uuid4().hex[:12]}"
+            return "POST", "/api/accounts/signup/", {"email": f"{name}@example.com", "username": name, "password": "benchpass1"}, None
+        raise ValueError(f"Unknown scenario {scenario}")
+
+    def run_scenario(self, scenario, requests, warmup=5):
+        if scenario == "detail" and not self.task_ids:
+            return None
+
+        for _ in range(warmup):
+            self.transport.request(*self.next_request(scenario))
+
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            method, path, body, token = self.next_request(scenario)
+            begin = time.perf_counter()
+            status, _, query_count = self.transport.request(method, path, body, token)
+            latencies.append((time.perf_counter() - begin) * 1000)
+            if query_count is not None:
+                queries.append(query_count)
+            if status >= 400:
+                errors += 1
+        return summarize(latencies, queries, errors, time.perf_counter() - started)
+
+    def run(self, scenarios, requests):
+        self.login()
+        return {scenario: self.run_scenario(scenario, requests) for scenario in scenarios}
+
+
+def compare(results, baseline, threshold):
+
+    #returns [(scenario, metric, before, after, change_pct, regressed)]
+    rows = []
+    for scenario, current in results.items():
+        before = baseline.get(scenario)
+        if not current or not before:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            rows.append((scenario, metric, old, new, round(change, 1), change > threshold))
+    return rows
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+#settings naming a cache alias whose invalidation has to reach every worker,
+#with the setting that switches the feature off (None if it is always on)
+SHARED_CACHE_SETTINGS = {
+    "RBAC_CACHE_ALIAS": None,
+    "SESSION_TOKEN_CACHE_ALIAS": None,
+    "TASKS_CACHE_ALIAS": "TASKS_RESPONSE_CACHE",
+}
+
+PROCESS_LOCAL_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+
+    #a per-process cache is fine for DEBUG (one runserver process), not for several workers
+    if settings.DEBUG:
+        return []
+
+    errors = []
+    for name, enabled in SHARED_CACHE_SETTINGS.items():
+        if enabled is not None and not getattr(settings, enabled, True):
+            continue
+        alias = getattr(settings, name, "default")
+        backend = settings.CACHES.get(alias, {}).get("BACKEND")
+        if backend in PROCESS_LOCAL_BACKENDS:
+            errors.append(Error(
+                f"{name} points at the per-process cache {alias!r}.",
+                hint="Use a cache shared by every worker, such as Redis or Memcached.",
+                id="backend.E001",
+            ))
+    return errors
@@ -0,0 +1,100 @@
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Length
+
+from backend.models import IdCounter
+from backend.tenancy import tenant_db
+
+
+_blocks = {}
+_lock = threading.Lock()
+
+
+def max_suffix(manager, field, prefix):
+    #longest then highest code, so TK10 beats TK9 without a full scan
+    last = (
+        manager.filter(**{f"{field}__startswith": prefix})
+        .annotate(code_length=Length(field))
+        .order_by("-code_length", f"-{field}")
+        .values_list(field, flat=True)
+        .first()
+    )
+    if not last:
+        return 0
+    try:
+        return int(last[len(prefix):])
+    except ValueError:
+        return 0
+
+
+def reserve_block(name, size, seed, floor=0):
+
+    #a reservation must outlive the caller's transaction: rolled back with it, the
+    #counter would hand this process's cached block to another one. inside a
+    #transaction it runs on a connection of its own, except on sqlite, whose single
+    #writer lock the caller holds. there floor, the end of this process's previous
+    #block, at least keeps a counter that went back from reissuing numbers twice
+    alias = tenant_db()
+    connection = connections[alias]
+    if not connection.in_atomic_block or connection.vendor == "sqlite":
+        return reserve_on(alias, name, size, seed, floor)
+
+    own_alias = f"{alias}:ids"
+    connections[own_alias] = connection.copy()
+    try:
+        return reserve_on(own_alias, name, size, seed, floor)
+    finally:
+        connections[own_alias].close()
+        del connections[own_alias]
+
+
+def reserve_on(using, name, size, seed, floor):
+    counters = IdCounter.objects.using(using)
+    with transaction.atomic(using=using):
+        updated = counters.filter(name=name).update(
+            next_value=Greatest(F("next_value"), floor) + size
+        )
+        if not updated:
+            try:
+                with transaction.atomic(using=using):
+                    start = max(seed() + 1, floor)
+                    counters.create(name=name, next_value=start + size)
+                return start, start + size
+            except IntegrityError:
+                #another worker created the counter first
+                counters.filter(name=name).update(
+                    next_value=Greatest(F("next_value"), floor) + size
+                )
+
+        end = counters.filter(name=name).values_list("next_value", flat=True).get()
+    return end - size, end
+
+
+def allocate_ids(name, count=1, seed=lambda: 0):
+
+    #hands out ids from a block reserved per process, one UPDATE per block
+    block_size = getattr(settings, "ID_BLOCK_SIZE", 50)
+    ids = []
+
+    #blocks are per database, every tenant database counts on its own
+    key = (tenant_db(), name)
+    with _lock:
+        start, end = _blocks.get(key, (0, 0))
+        while len(ids) < count:
+            if start >= end:
+                start, end = reserve_block(name, max(block_size, count - len(ids)), seed, floor=end)
+            take = min(end - start, count - len(ids))
+            ids.extend(range(start, start + take))
+            start += take
+        _blocks[key] = (start, end)
+
+    return ids
+
+
+def next_codes(manager, field, prefix, count=1):
+    name = f"{manager.model._meta.label_lower}.{field}"
+    ids = allocate_ids(name, count, seed=lambda: max_suffix(manager, field, prefix))
+    return [f"{prefix}{value}" for value in ids]
@@ -0,0 +1,99 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from backend.metrics import registry
+from backend.models import Job
+from backend.tenancy import tenant_db, use_tenant
+
+
+logger = logging.getLogger("backend.jobs")
+
+#name -> function, filled by @job in each app's jobs.py
+handlers = {}
+
+
+def job(name):
+    def register(func):
+        handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(name, delay=0, **payload):
+
+    #a plain insert, so it commits or rolls back with the caller's transaction
+    if name not in handlers:
+        raise KeyError(f"Unknown job {name}")
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_after=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def max_attempts():
+    return getattr(settings, "JOBS_MAX_ATTEMPTS", 5)
+
+
+def claim(batch_size):
+
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, "JOBS_LOCK_TIMEOUT", 300))
+    queryset = Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale)
+    ).order_by("run_after", "id")
+
+    using = tenant_db()
+    with transaction.atomic(using=using):
+        if connections[using].features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if ids:
+            Job.objects.filter(id__in=ids).update(
+                status=Job.RUNNING, locked_at=now, attempts=F("attempts") + 1
+            )
+    return list(Job.objects.filter(id__in=ids).order_by("run_after", "id"))
+
+
+def run(job):
+    try:
+        if job.name not in handlers:
+            raise KeyError(f"No handler registered for {job.name}")
+        #in the tenant that queued it, tenants sharing a database share its queue
+        with use_tenant(job.tenant), transaction.atomic(using=tenant_db(job.tenant)):
+            handlers[job.name](**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        if job.attempts >= max_attempts():
+            job.status = Job.FAILED
+            logger.error("job %s failed for good\n%s", job, job.last_error)
+        else:
+            #exponential backoff, 2s, 4s, 8s...
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=2 ** job.attempts)
+        job.save(update_fields=["status", "run_after", "locked_at", "last_error"])
+        registry.increment("jobs_total", job=job.name, result="error")
+        return False
+
+    job.delete()
+    registry.increment("jobs_total", job=job.name, result="ok")
+    return True
+
+
+def run_pending(batch_size=100):
+
+    #one claim; returns (succeeded, failed)
+    succeeded = failed = 0
+    for pending in claim(batch_size):
+        if run(pending):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
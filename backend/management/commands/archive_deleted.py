@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.archive import archivable_models, archive_deleted, pending_counts
+from backend.models import SoftDeleteModel
+from backend.tenancy import add_tenant_argument, command_tenant
+
+
+class Command(BaseCommand):
+    help = (
+        "Move rows soft-deleted longer than the retention window into backend.ArchivedRow, in batches. "
+        "Archived rows come back with Model.restore_archived(pk)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Retention window, defaults to ARCHIVE_RETENTION_DAYS")
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows per transaction, defaults to ARCHIVE_BATCH_SIZE")
+        parser.add_argument("--models", nargs="*", default=None, help="app_label.Model to archive, default all soft-delete models")
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would be archived")
+        add_tenant_argument(parser)
+
+    def get_models(self, labels):
+        if not labels:
+            return archivable_models()
+
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError(f"Unknown model {label}")
+            if not issubclass(model, SoftDeleteModel):
+                raise CommandError(f"{label} is not a soft-delete model")
+            models.append(model)
+        return [model for model in archivable_models() if model in models]
+
+    def handle(self, *args, **options):
+        with command_tenant(options["tenant"]):
+            self.archive(options)
+
+    def archive(self, options):
+        models = self.get_models(options["models"])
+
+        if options["dry_run"]:
+            for label, count in pending_counts(options["days"], models).items():
+                self.stdout.write(f"{label}: {count} to archive")
+            return
+
+        counts = archive_deleted(
+            days=options["days"],
+            batch_size=options["batch_size"],
+            models=models,
+            sleep=options["sleep"],
+            log=self.stdout.write
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {sum(counts.values())} rows"))
@@ -0,0 +1,112 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from accounts.models import User
+from backend.seeding import seed_dataset
+from rbac.services import user_permissions_query
+from tasks.changes import ORDERING as CHANGES_ORDERING
+from tasks.filters import filter_tasks
+from tasks.models import Task
+from tasks.pagination import ASSIGNED_KEYS, ORDERING, ordering
+
+
+SQLITE_SCAN = re.compile(r"\bSCAN (\w+)(.*)")
+
+
+def query_shapes(owner, assignee_email, task):
+
+    #(name, queryset, tables that must be read through an index)
+    live = Task.objects.all()
+    owned = live.filter(owner=owner)
+    cursor = Q(created_at__lt=task.created_at) | Q(created_at=task.created_at, id__lt=task.pk)
+    since = Q(updated_at__gt=task.updated_at) | Q(updated_at=task.updated_at, id__gt=task.pk)
+
+    return [
+        ("task list, task.admin", live.order_by(*ORDERING)[:10], ["tasks_task"]),
+        ("task list, owner", owned.order_by(*ORDERING)[:10], ["tasks_task"]),
+        ("task list, owner + is_completed", filter_tasks(owned, {"is_completed": "true"}).order_by(*ORDERING)[:10], ["tasks_task"]),
+        ("task list, owner next cursor", owned.filter(cursor).order_by(*ORDERING)[:11], ["tasks_task"]),
+        ("task list, assigned_user", filter_tasks(live, {"assigned_user": assignee_email}).order_by(*ordering(ASSIGNED_KEYS))[:10], ["tasks_task", "tasks_taskassignment"]),
+        ("task detail", owned.filter(task_id=task.task_id), ["tasks_task"]),
+        ("task changes, owner since", Task.all_objects.filter(since, owner=owner).order_by(*CHANGES_ORDERING)[:101], ["tasks_task"]),
+        ("rbac permissions", user_permissions_query(owner), ["rbac_userrole", "rbac_rolepermission"]),
+        ("jwt user lookup", User.objects.filter(pk=owner.pk), ["accounts_user"]),
+        ("login user lookup", User.objects.filter(email=owner.email), ["accounts_user"]),
+    ]
+
+
+def postgres_seq_scans(plan, tables):
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in tables:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(postgres_seq_scans(child, tables))
+    return found
+
+
+def sqlite_seq_scans(plan, tables):
+    found = []
+    for line in plan.splitlines():
+        match = SQLITE_SCAN.search(line)
+        if match and match.group(1) in tables and "USING" not in match.group(2):
+            found.append(match.group(1))
+    return found
+
+
+class Command(BaseCommand):
+    help = "Explain every API query shape and fail if one falls back to a sequential scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed-users", type=int, default=0, help="Seed this many users before auditing")
+        parser.add_argument("--seed-tasks", type=int, default=0, help="Seed this many tasks before auditing")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows instead of rolling back")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed_tasks"]:
+                seed_dataset(
+                    users=options["seed_users"] or max(10, options["seed_tasks"] // 100),
+                    tasks=options["seed_tasks"],
+                    log=self.stdout.write
+                )
+
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            failures = self.audit()
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{failures} query plan(s) use a sequential scan")
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes"))
+
+    def audit(self):
+        task = Task.objects.order_by("id").first()
+        through = Task.assigned_users.through.objects.select_related("user").first()
+        if task is None or task.owner is None or through is None:
+            raise CommandError("Need tasks with owners and assignees to audit, use --seed-tasks")
+
+        failures = 0
+        for name, queryset, tables in query_shapes(task.owner, through.user.email, task):
+            if connection.vendor == "postgresql":
+                plan = json.loads(queryset.explain(analyze=True, format="json"))
+                if isinstance(plan, list):
+                    plan = plan[0]
+                scans = postgres_seq_scans(plan["Plan"], tables)
+                timing = f" ({plan.get('Execution Time', 0):.2f} ms)"
+            else:
+                scans = sqlite_seq_scans(queryset.explain(), tables)
+                timing = ""
+
+            if scans:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"SEQ SCAN  {name}: {', '.join(sorted(set(scans)))}{timing}"))
+            else:
+                self.stdout.write(f"ok        {name}{timing}")
+        return failures
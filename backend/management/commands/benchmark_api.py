@@ -0,0 +1,100 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+
+from accounts.models import User
+from backend.benchmark import Benchmark, ClientTransport, HTTPTransport, compare
+from backend.seeding import ensure_roles
+
+
+class Command(BaseCommand):
+    help = "Drive the API with a repeatable workload and record latency percentiles, queries per request and throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+        parser.add_argument("--scenarios", default=",".join(Benchmark.scenarios))
+        parser.add_argument("--email", help="User to benchmark as, defaults to the owner of the newest seeded task")
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process test client")
+        parser.add_argument("--output", help="Write results as JSON to this file")
+        parser.add_argument("--baseline", help="Compare against an earlier --output file")
+        parser.add_argument("--threshold", type=float, default=10.0, help="Percent slowdown that counts as a regression")
+        parser.add_argument("--keep-writes", action="store_true", help="Keep rows created by the test client run")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options["scenarios"].split(",") if name]
+        unknown = set(scenarios) - set(Benchmark.scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        email = options["email"] or self.default_email()
+
+        if options["base_url"]:
+            results = Benchmark(HTTPTransport(options["base_url"]), email, options["password"], options["seed"]).run(scenarios, options["requests"])
+        else:
+            #measures the handlers, not the login/signup throttles
+            with transaction.atomic(), override_settings(THROTTLE_RATES={}):
+                ensure_roles()
+                results = Benchmark(ClientTransport(), email, options["password"], options["seed"]).run(scenarios, options["requests"])
+                if not options["keep_writes"]:
+                    transaction.set_rollback(True)
+
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "mode": "http" if options["base_url"] else "client",
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "requests": options["requests"],
+                "email": email,
+            },
+            "scenarios": results,
+        }
+
+        self.print_results(results)
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as fh:
+                baseline = json.load(fh)["scenarios"]
+            regressions = self.print_comparison(compare(results, baseline, options["threshold"]))
+            if regressions:
+                raise CommandError(f"{regressions} metric(s) regressed by more than {options['threshold']}%")
+
+    def default_email(self):
+        user = User.objects.filter(owned_tasks__isnull=False, email__startswith="seed-").order_by("-owned_tasks__created_at").first()
+        if user is None:
+            raise CommandError("No seeded users found, run seed_data first or pass --email")
+        return user.email
+
+    def print_results(self, results):
+        self.stdout.write(f"{'scenario':<12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'rps':>9} {'errors':>7}")
+        for scenario, row in results.items():
+            if row is None:
+                self.stdout.write(f"{scenario:<12} skipped")
+                continue
+            queries = "-" if row["queries_per_request"] is None else row["queries_per_request"]
+            self.stdout.write(
+                f"{scenario:<12} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} "
+                f"{queries:>8} {row['throughput_rps']:>9} {row['errors']:>7}"
+            )
+
+    def print_comparison(self, rows):
+        regressions = 0
+        for scenario, metric, before, after, change, regressed in rows:
+            line = f"{scenario:<12} {metric:<20} {before:>9} -> {after:>9} ({change:+.1f}%)"
+            if regressed:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.jobs import run_pending
+from backend.tenancy import add_tenant_argument, command_tenant
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (backend.Job). Loops until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+        parser.add_argument("--batch-size", type=int, default=100, help="Jobs claimed per round")
+        parser.add_argument("--sleep", type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        add_tenant_argument(parser)
+
+    def handle(self, *args, **options):
+        with command_tenant(options["tenant"]):
+            self.run(options)
+
+    def run(self, options):
+        while True:
+            succeeded, failed = run_pending(options["batch_size"])
+            if succeeded or failed:
+                self.stdout.write(f"ran {succeeded} jobs, {failed} failed")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["sleep"])
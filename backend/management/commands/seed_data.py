@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from backend.seeding import seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Seed users, roles and tasks with assignees for benchmarking. Every seeded user has the password 'password'."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--tasks", type=int, default=10000)
+        parser.add_argument("--max-assignees", type=int, default=3)
+        parser.add_argument("--admin-ratio", type=float, default=0.05)
+        parser.add_argument("--days", type=int, default=365, help="Spread created_at over this many days")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for repeatable data")
+
+    def handle(self, *args, **options):
+        user_ids = seed_dataset(
+            users=options["users"],
+            tasks=options["tasks"],
+            max_assignees=options["max_assignees"],
+            admin_ratio=options["admin_ratio"],
+            days=options["days"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+            log=self.stdout.write
+        )
+        self.stdout.write(self.style.SUCCESS(f"Seeded {len(user_ids)} users and {options['tasks']} tasks"))
@@ -0,0 +1,311 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from backend.metrics import COUNT_BUCKETS, registry, request_timings
+from backend.routers import RoutingState, ais_pinned, apin, is_pinned, pin, routing_state
+from backend.tenancy import current_tenant, default_tenant, tenants, use_tenant
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger("backend.slow_requests")
+
+
+
+class QueryRecorder:
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000))
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    view_class = getattr(match.func, "view_class", None)
+    if view_class is not None:
+        return view_class.__name__
+    return match.url_name or match.func.__name__
+
+
+class MetricsMiddleware:
+
+    #wall time, db queries, serializer and permission time per view
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        timings = {}
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            request_timings.reset(token)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.record(request, response, elapsed, recorder, timings)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        timings = {}
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = await self.get_response(request)
+        finally:
+            request_timings.reset(token)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.record(request, response, elapsed, recorder, timings)
+        return response
+
+    def record(self, request, response, elapsed, recorder, timings):
+        view = view_name(request)
+        db_time = sum(duration for _, duration in recorder.queries)
+
+        registry.increment("http_requests_total", view=view, method=request.method, status=response.status_code)
+        registry.observe("http_request_duration_ms", elapsed, view=view, method=request.method)
+        registry.observe("db_queries_per_request", len(recorder.queries), buckets=COUNT_BUCKETS, view=view)
+        registry.observe("db_query_duration_ms", db_time, view=view)
+        registry.observe("serializer_duration_ms", timings.get("serializer", 0.0), view=view)
+        registry.observe("permission_check_duration_ms", timings.get("permission", 0.0), view=view)
+
+        slow_ms = getattr(settings, "SLOW_REQUEST_MS", None)
+        if slow_ms is not None and elapsed >= slow_ms:
+            logger.warning(
+                "Slow request %s %s (%s) took %.1f ms, %d queries in %.1f ms\n%s",
+                request.method, request.path, view, elapsed, len(recorder.queries), db_time,
+                "\n".join(f"  {duration:8.2f} ms  {sql}" for sql, duration in recorder.queries)
+            )
+
+
+def accepted_encodings(header):
+
+    #coding -> q from Accept-Encoding, "br;q=0" means br is refused
+    codings = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding.lower()] = q
+    return codings
+
+
+def accepts(codings, coding):
+    return codings.get(coding, codings.get("*", 0.0)) > 0
+
+
+def brotli_sequence(chunks):
+    compressor = brotli.Compressor(quality=4)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def abrotli_sequence(chunks):
+    compressor = brotli.Compressor(quality=4)
+    async for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+
+    #brotli when the client accepts it and the package is installed, gzip otherwise.
+    #bodies under COMPRESS_MIN_BYTES are not worth the cpu.
+    #brotli has no room for the random padding GZipMiddleware adds against BREACH,
+    #so paths under COMPRESS_GZIP_ONLY_PATHS (the ones returning secrets) stay on gzip
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, "COMPRESS_MIN_BYTES", 1024):
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+
+        codings = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        gzip_only = request.path.startswith(tuple(getattr(settings, "COMPRESS_GZIP_ONLY_PATHS", ())))
+        if brotli is None or gzip_only or not accepts(codings, "br"):
+            if not accepts(codings, "gzip"):
+                patch_vary_headers(response, ("Accept-Encoding",))
+                return response
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = abrotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = brotli_sequence(response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            compressed = brotli.compress(response.content, quality=4)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        #same as GZipMiddleware, the body changed so a strong ETag becomes weak
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+
+def stream_in_tenant(tenant, content):
+    with use_tenant(tenant):
+        yield from content
+
+
+async def astream_in_tenant(tenant, content):
+    with use_tenant(tenant):
+        async for chunk in content:
+            yield chunk
+
+
+class TenantMiddleware:
+
+    #picks the tenant from the TENANT_HEADER request header, must come before
+    #anything that loads the user. the tenant decides the database and cache keys
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def resolve(self, request):
+        tenant = request.headers.get(getattr(settings, "TENANT_HEADER", "X-Tenant")) or default_tenant()
+        return tenant if tenant in tenants() else None
+
+    def unknown(self):
+        return JsonResponse({"detail": "Unknown tenant."}, status=404)
+
+    def finish(self, tenant, response):
+        #streamed bodies are read after the middleware returns
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = astream_in_tenant(tenant, response.streaming_content)
+            else:
+                response.streaming_content = stream_in_tenant(tenant, response.streaming_content)
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        tenant = self.resolve(request)
+        if tenant is None:
+            return self.unknown()
+        request.tenant = tenant
+        token = current_tenant.set(tenant)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_tenant.reset(token)
+        return self.finish(tenant, response)
+
+    async def __acall__(self, request):
+        tenant = self.resolve(request)
+        if tenant is None:
+            return self.unknown()
+        request.tenant = tenant
+        token = current_tenant.set(tenant)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_tenant.reset(token)
+        return self.finish(tenant, response)
+
+
+class ReplicaPinMiddleware:
+
+    #after a request writes, keep the client on the primary for REPLICA_PIN_SECONDS,
+    #must come after the middleware that sets request.user
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        state = RoutingState(pinned=is_pinned(request))
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if state.wrote:
+            pin(response, request)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=await ais_pinned(request))
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if state.wrote:
+            await apin(response, request)
+        return response
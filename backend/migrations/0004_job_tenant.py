@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 21:04
+
+import backend.tenancy
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='tenant',
+            field=models.CharField(default=backend.tenancy.get_current_tenant, editable=False, max_length=63),
+        ),
+    ]
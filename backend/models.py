@@ -1,12 +1,37 @@
-from django.db import models
+import datetime
+
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone
 
+from backend.tenancy import get_current_tenant, tenant_db
+
 
 class SoftDeleteManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
 
 
+class TenantScopedMixin:
+
+    #rows of the tenant handling this request, see backend.tenancy
+    def get_queryset(self):
+        return super().get_queryset().filter(tenant=get_current_tenant())
+
+
+class TenantManager(TenantScopedMixin, SoftDeleteManager):
+    pass
+
+
+class TenantModel(models.Model):
+
+    tenant = models.CharField(max_length=63, default=get_current_tenant, editable=False)
+
+    class Meta:
+        abstract = True
+
+
 class SoftDeleteModel(models.Model):
 
     is_deleted = models.BooleanField(default=False)
@@ -15,10 +40,15 @@ class SoftDeleteModel(models.Model):
     class Meta:
         abstract = True
 
-    def delete(self, using=None, keep_parents=False):
+    def soft_delete_fields(self):
+        #auto_now fields are only written when listed, change feeds rely on updated_at
+        auto_now = [field.name for field in self._meta.concrete_fields if getattr(field, "auto_now", False)]
+        return ["is_deleted", "deleted_at"] + auto_now
+
+    def delete(self, using=None, keep_parents=False, **save_options):
         self.is_deleted = True
         self.deleted_at = timezone.now()
-        self.save(update_fields=["is_deleted", "deleted_at"])
+        self.save(update_fields=self.soft_delete_fields(), **save_options)
 
     def hard_delete(self):
         super().delete()
@@ -26,4 +56,105 @@ class SoftDeleteModel(models.Model):
     def restore(self):
         self.is_deleted = False
         self.deleted_at = None
-        self.save(update_fields=["is_deleted", "deleted_at"])
+        self.save(update_fields=self.soft_delete_fields())
+
+    @classmethod
+    def restore_archived(cls, pk):
+        #rows moved out by the archive_deleted command
+        return ArchivedRow.objects.get(model=cls._meta.label_lower, object_pk=str(pk)).restore()
+
+
+class IdCounter(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}={self.next_value}"
+
+
+class Job(TenantModel):
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        #the worker's claim query, finished jobs are deleted
+        indexes = [models.Index(fields=["status", "run_after"], name="job_status_run_after_idx")]
+
+    def __str__(self):
+        return f"{self.name}#{self.pk} ({self.status})"
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+
+    #full microseconds, keyset cursors compare created_at exactly
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class ArchivedRow(models.Model):
+    model = models.CharField(max_length=100)
+    object_pk = models.CharField(max_length=64)
+    #django "python" serializer document, m2m fields included
+    payload = models.JSONField(encoder=ArchiveEncoder)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["model", "object_pk"], name="archivedrow_model_pk_uniq")
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_pk}"
+
+    @classmethod
+    def ensure_live_row(cls, model, pk):
+
+        #put a referenced row back into its table, still soft-deleted
+        if pk is None or model._base_manager.filter(pk=pk).exists():
+            return True
+        archived = cls.objects.filter(model=model._meta.label_lower, object_pk=str(pk)).first()
+        if archived is None:
+            return False
+        archived.unarchive()
+        return True
+
+    def unarchive(self):
+        with transaction.atomic(using=tenant_db()):
+            document = next(serializers.deserialize("python", [self.payload]))
+            instance = document.object
+
+            for field in instance._meta.concrete_fields:
+                if not field.is_relation:
+                    continue
+                if not self.ensure_live_row(field.related_model, getattr(instance, field.attname)):
+                    if not field.null:
+                        raise ValueError(f"{self}: {field.name} {getattr(instance, field.attname)} no longer exists")
+                    setattr(instance, field.attname, None)
+
+            for name, pks in document.m2m_data.items():
+                related_model = instance._meta.get_field(name).related_model
+                document.m2m_data[name] = [pk for pk in pks if self.ensure_live_row(related_model, pk)]
+
+            document.save()
+            self.delete()
+        return instance
+
+    def restore(self):
+        with transaction.atomic(using=tenant_db()):
+            instance = self.unarchive()
+            instance.restore()
+        return instance
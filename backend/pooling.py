@@ -0,0 +1,36 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from backend.metrics import registry
+
+
+#psycopg_pool get_stats() keys exported as db_pool_<key>
+POOL_STATS = (
+    "pool_min", "pool_max", "pool_size", "pool_available",
+    "requests_waiting", "requests_num", "requests_wait_ms", "requests_errors", "connections_num",
+)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+
+    #with CONN_MAX_AGE or a pool this should grow far slower than http_requests_total
+    registry.increment("db_connections_opened_total", alias=connection.alias)
+
+
+def pool_stats(alias):
+    connection = connections[alias]
+    if not connection.settings_dict.get("OPTIONS", {}).get("pool"):
+        return None
+    #not opened until the first query, stats of an idle pool are all zero
+    return connection.pool.get_stats()
+
+
+def record_pool_stats():
+    for alias in connections:
+        stats = pool_stats(alias)
+        if stats is None:
+            continue
+        for key in POOL_STATS:
+            registry.set_gauge(f"db_pool_{key}", stats.get(key, 0), alias=alias)
@@ -0,0 +1,161 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = "primary_pin"
+
+
+class RoutingState:
+
+    #one per request, set by backend.middleware.ReplicaPinMiddleware
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+routing_state = ContextVar("routing_state", default=None)
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 5)
+
+
+def get_cache():
+    return caches[getattr(settings, "REPLICA_PIN_CACHE_ALIAS", "default")]
+
+
+def pin_key(user_id):
+    return f"replica:pin:{user_id}"
+
+
+def pinned_by_cookie(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pinned_user(request):
+    user = getattr(request, "user", None)
+    return user if user is not None and user.is_authenticated else None
+
+
+def is_pinned(request):
+
+    #a recent write by this client (cookie) or this account (shared cache)
+    if pinned_by_cookie(request):
+        return True
+    user = pinned_user(request)
+    return user is not None and bool(get_cache().get(pin_key(user.pk)))
+
+
+async def ais_pinned(request):
+    if pinned_by_cookie(request):
+        return True
+    user = pinned_user(request)
+    return user is not None and bool(await get_cache().aget(pin_key(user.pk)))
+
+
+def set_pin_cookie(response, seconds):
+    response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite="Lax")
+
+
+def pin(response, request):
+    seconds = pin_seconds()
+    set_pin_cookie(response, seconds)
+    user = pinned_user(request)
+    if user is not None:
+        get_cache().set(pin_key(user.pk), True, seconds)
+
+
+async def apin(response, request):
+    seconds = pin_seconds()
+    set_pin_cookie(response, seconds)
+    user = pinned_user(request)
+    if user is not None:
+        await get_cache().aset(pin_key(user.pk), True, seconds)
+
+
+def pick_replica(aliases):
+    return random.choice(aliases)
+
+
+@contextmanager
+def replica_reads():
+
+    #reads in this block may go to a replica, unless the client is pinned to the primary
+    state = routing_state.get()
+    aliases = replicas()
+    if state is None or state.pinned or not aliases or state.replica is not None:
+        yield
+        return
+
+    #one replica per request, so every query in it sees the same snapshot
+    state.replica = pick_replica(aliases)
+    try:
+        yield
+    finally:
+        state.replica = None
+
+
+def in_primary_transaction():
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or state.replica is None or state.wrote or in_primary_transaction():
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        #replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+def recent_key(name):
+    return f"replica:recent:{name}"
+
+
+def mark_recent_write(name):
+
+    #called next to cache version bumps, see replica_may_be_stale
+    if replicas():
+        get_cache().set(recent_key(name), True, pin_seconds())
+
+
+def replica_may_be_stale(name):
+
+    #rows read from a replica right after a write may predate it, results built
+    #from them must not be cached under the new version
+    state = routing_state.get()
+    if state is None or state.replica is None or state.wrote:
+        return False
+    return bool(get_cache().get(recent_key(name)))
@@ -0,0 +1,106 @@
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from accounts.models import User
+from backend.ids import next_codes
+from rbac.models import Permission, Role, RolePermission, UserRole
+from tasks.models import Task
+from tasks.signals import tasks_bulk_changed
+
+
+DEFAULT_ROLES = {
+    "Admin": ["task.create", "task.view", "task.update", "task.delete", "task.admin"],
+    "User": ["task.create", "task.view", "task.update"],
+}
+
+WORDS = (
+    "report invoice deploy review design backend frontend release sprint bug "
+    "customer meeting budget roadmap migration security audit onboarding docs "
+    "database cache search mobile payment export import dashboard metrics"
+).split()
+
+
+def ensure_roles():
+    roles = {}
+    for name, codes in DEFAULT_ROLES.items():
+        role, _ = Role.objects.get_or_create(name=name)
+        for code in codes:
+            permission, _ = Permission.objects.get_or_create(code=code)
+            RolePermission.objects.get_or_create(role=role, permission=permission)
+        roles[name] = role
+    return roles
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed_dataset(users=100, tasks=1000, max_assignees=3, admin_ratio=0.05,
+                 completed_ratio=0.3, days=365, batch_size=1000, seed=None, log=None):
+
+    #bulk inserts seeded users/roles/tasks, returns the created user ids
+    rng = random.Random(seed)
+    roles = ensure_roles()
+    run = uuid.uuid4().hex[:8]
+    password = make_password("password")
+
+    user_objs = [
+        User(
+            user_id=code,
+            email=f"seed-{run}-{n}@example.com",
+            username=f"seed-{run}-{n}",
+            password=password,
+        )
+        for n, code in enumerate(next_codes(User.all_objects, "user_id", "USR", count=users))
+    ]
+    User.objects.bulk_create(user_objs, batch_size=batch_size)
+    user_ids = [user.pk for user in user_objs]
+
+    UserRole.objects.bulk_create(
+        [
+            UserRole(user_id=pk, role=roles["Admin"] if rng.random() < admin_ratio else roles["User"])
+            for pk in user_ids
+        ],
+        batch_size=batch_size
+    )
+    if log:
+        log(f"seeded {users} users")
+
+    now = timezone.now()
+    Through = Task.assigned_users.through
+    created = 0
+    while created < tasks:
+        size = min(batch_size, tasks - created)
+        batch = [
+            Task(
+                task_id=code,
+                title=sentence(rng, rng.randint(2, 6)),
+                description=sentence(rng, rng.randint(0, 30)),
+                is_completed=rng.random() < completed_ratio,
+                owner_id=rng.choice(user_ids),
+            )
+            for code in next_codes(Task.all_objects, "task_id", "TK", count=size)
+        ]
+        Task.objects.bulk_create(batch)
+
+        #created_at is auto_now_add, spread it out afterwards
+        for task in batch:
+            task.created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+        Task.objects.bulk_update(batch, ["created_at"])
+
+        Through.objects.bulk_create([
+            Through(task_id=task.pk, user_id=user_id)
+            for task in batch
+            for user_id in rng.sample(user_ids, min(len(user_ids), rng.randint(0, max_assignees)))
+        ])
+        tasks_bulk_changed.send(sender=Task, task_ids=[task.pk for task in batch], action="created")
+
+        created += size
+        if log:
+            log(f"seeded {created}/{tasks} tasks")
+
+    return user_ids
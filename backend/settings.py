@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -15,6 +16,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'backend',
     'tasks',
     'accounts',
     'rest_framework',
@@ -26,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.MetricsMiddleware',
+    'backend.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -33,7 +37,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.TenantMiddleware',
     'login.middleware.SessionJWTMiddleware',   
+    'backend.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -55,17 +61,56 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+#connection management, per worker process, from the environment
+#DB_CONN_MAX_AGE>0 keeps connections for that many seconds, health checked before reuse. it is
+#for sync WSGI workers only: under ASGI every request thread keeps its own connection open.
+#DB_POOL=1 switches to a psycopg pool instead (threaded / ASGI servers, needs psycopg[pool])
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0'))
+DB_POOL = os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes')
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'taskmanager',
-        'USER': 'taskuser',
-        'PASSWORD': 'password',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'taskmanager'),
+        'USER': os.environ.get('DB_USER', 'taskuser'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'password'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        #django refuses persistent connections together with a pool
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': DB_POOL_MIN_SIZE,
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': DB_POOL_TIMEOUT,
+            },
+        } if DB_POOL else {},
     }
 }
 
+#read replicas, aliases added to DATABASES above, e.g.
+#DATABASES['replica1'] = {**DATABASES['default'], 'HOST': 'replica1', 'TEST': {'MIRROR': 'default'}}
+#task list/detail GETs and permission lookups read from one of them unless the client wrote recently
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['backend.tenancy.TenantRouter', 'backend.routers.ReplicaRouter']
+#seconds a client stays on the primary after a write (cookie + per-user cache marker)
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_CACHE_ALIAS = 'default'
+
+#tenants, picked per request from the X-Tenant header. each maps to the alias holding
+#its rows, small tenants share 'default', large ones get their own database, e.g.
+#DATABASES['acme'] = {**DATABASES['default'], 'NAME': 'taskmanager_acme'}
+#or their own postgres schema:
+#DATABASES['acme'] = backend.tenancy.schema_database(DATABASES['default'], 'acme')
+#then: python manage.py migrate --database acme
+TENANTS = {'public': 'default'}
+DEFAULT_TENANT = 'public'
+TENANT_HEADER = 'X-Tenant'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -83,6 +128,11 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "accounts.User"
 
+#email is unique per (tenant, email), the backend looks users up in the current tenant.
+#auth.W004 warns that USERNAME_FIELD is not unique on its own, which is intended here
+AUTHENTICATION_BACKENDS = ["accounts.backends.TenantModelBackend"]
+SILENCED_SYSTEM_CHECKS = ["auth.W004"]
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -93,15 +143,87 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        #keys are prefixed with the current tenant
+        'KEY_FUNCTION': 'backend.tenancy.make_key',
+    }
+}
+
+#rbac permission cache. the alias must be shared by every worker (Redis, Memcached),
+#otherwise a revoke only reaches the worker that handled it; check --deploy enforces this
+RBAC_CACHE_ALIAS = 'default'
+RBAC_CACHE_TIMEOUT = 300
+RBAC_LRU_SIZE = 1024
+#seconds a permission set stays in the per-process LRU
+RBAC_LRU_SECONDS = 5
+
+#login session map (user id -> current session_token), shared by every worker like RBAC_CACHE_ALIAS
+SESSION_TOKEN_CACHE_ALIAS = 'default'
+SESSION_TOKEN_CACHE_TIMEOUT = 3600
+
+#per-owner cache of task list/detail responses, the alias must be shared by every worker
+#so a write retires the cached bodies and ETags everywhere
+TASKS_RESPONSE_CACHE = True
+TASKS_CACHE_ALIAS = 'default'
+TASKS_RESPONSE_CACHE_TIMEOUT = 60
+#rows per server-side cursor fetch / assignee batch in /api/tasks/task/export/
+TASKS_EXPORT_CHUNK_SIZE = 2000
+#/api/tasks/changes/ only returns rows older than this, so late commits can't land behind a client's token
+TASKS_CHANGES_SETTLE_SECONDS = 2
+
+#responses at least this big are gzip/brotli compressed for clients that accept it
+COMPRESS_MIN_BYTES = 1024
+
+#responses carrying tokens, only gzip (randomly padded against BREACH) is used for them
+COMPRESS_GZIP_ONLY_PATHS = ["/api/auth/", "/api/accounts/"]
+
+#instrumentation, /metrics/ is open unless METRICS_TOKEN is set
+METRICS_TOKEN = None
+#log requests slower than this (ms) with their SQL, None disables
+SLOW_REQUEST_MS = None
+
+#task_id / user_id numbers reserved per process at a time
+ID_BLOCK_SIZE = 50
+
+#archive_deleted command, soft-deleted rows older than this move to backend.ArchivedRow
+ARCHIVE_RETENTION_DAYS = 90
+ARCHIVE_BATCH_SIZE = 500
+
+#background jobs (backend.Job), run with: python manage.py run_jobs
+JOBS_MAX_ATTEMPTS = 5
+#seconds before a job stuck in "running" is picked up again
+JOBS_LOCK_TIMEOUT = 300
+
+#token-bucket throttling (backend.throttling), rates per view scope, None is unlimited
+THROTTLE_RATES = {
+    'default': {'ip': None, 'account': None},
+    'login': {'ip': '30/min', 'account': '10/min'},
+    'signup': {'ip': '10/min', 'account': None},
+}
+#None keeps buckets in process memory, a cache alias shares them between workers
+THROTTLE_CACHE_ALIAS = None
+THROTTLE_MAX_BUCKETS = 100000
+
 #jwt
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'login.authentication.SessionJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    #orjson when installed, see backend.renderers
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'backend.throttling.IPThrottle',
+        'backend.throttling.AccountThrottle',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -112,6 +234,8 @@ SIMPLE_JWT = {
 
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': False,
+    #one more column on the login write
+    'UPDATE_LAST_LOGIN': False,
 
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
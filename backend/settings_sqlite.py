@@ -0,0 +1,20 @@
+#local runs without postgres, one sqlite file per tenant database:
+#python manage.py migrate --settings=backend.settings_sqlite
+#python manage.py migrate --settings=backend.settings_sqlite --database tenant_big
+#python manage.py test --settings=backend.settings_sqlite
+from backend.settings import *  # noqa: F401,F403
+from backend.settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'tenant_big': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_tenant_big.sqlite3',
+    },
+}
+
+#"small" shares the default database with "public", "big" has its own
+TENANTS = {'public': 'default', 'small': 'default', 'big': 'tenant_big'}
@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+DEFAULT_TENANT = "public"
+
+#set per request by backend.middleware.TenantMiddleware, use_tenant() elsewhere
+current_tenant = ContextVar("current_tenant", default=None)
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+def tenants():
+    return getattr(settings, "TENANTS", {DEFAULT_TENANT: DEFAULT_DB_ALIAS})
+
+
+def default_tenant():
+    return getattr(settings, "DEFAULT_TENANT", DEFAULT_TENANT)
+
+
+def get_current_tenant():
+    return current_tenant.get() or default_tenant()
+
+
+def tenant_db(tenant=None):
+
+    #the alias holding a tenant's rows, small tenants share one
+    tenant = tenant or get_current_tenant()
+    try:
+        return tenants()[tenant]
+    except KeyError:
+        raise UnknownTenant(tenant)
+
+
+@contextmanager
+def use_tenant(tenant):
+    tenant_db(tenant)
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+def add_tenant_argument(parser):
+    parser.add_argument(
+        "--tenant", default=None,
+        help="Work on this tenant's database (tenants sharing it are included), defaults to DEFAULT_TENANT"
+    )
+
+
+@contextmanager
+def command_tenant(tenant):
+    tenant = tenant or default_tenant()
+    if tenant not in tenants():
+        raise CommandError(f"Unknown tenant {tenant}")
+    with use_tenant(tenant):
+        yield
+
+
+#keys that must not vary with the X-Tenant a client sends: a throttle bucket
+#counts one address however it rotates the header
+GLOBAL_KEY_PREFIXES = ("throttle:",)
+
+
+def make_key(key, key_prefix, version):
+
+    #CACHES KEY_FUNCTION, scoped by database alias rather than tenant name: pks
+    #repeat across databases, and tenants sharing one also share its rbac rows
+    if key.startswith(GLOBAL_KEY_PREFIXES):
+        return f"{key_prefix}:{version}:{key}"
+    return f"{key_prefix}:{version}:{tenant_db()}:{key}"
+
+
+def schema_database(settings_dict, schema):
+
+    #a postgres alias for a schema-per-tenant layout, same server, own search_path
+    options = {**settings_dict.get("OPTIONS", {}), "options": f"-c search_path={schema}"}
+    return {**settings_dict, "OPTIONS": options}
+
+
+class TenantRouter:
+
+    #every tenant alias carries the full schema, a tenant's rows live on exactly
+    #one of them. tenants on the default alias fall through to ReplicaRouter
+    def alias_for(self, hints):
+        instance = hints.get("instance")
+        alias = tenant_db(getattr(instance, "tenant", None))
+        if alias == DEFAULT_DB_ALIAS:
+            return None
+        return alias
+
+    def db_for_read(self, model, **hints):
+        return self.alias_for(hints)
+
+    def db_for_write(self, model, **hints):
+        return self.alias_for(hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db and obj2._state.db and obj1._state.db != obj2._state.db:
+            #a replica and its primary are told apart by ReplicaRouter
+            if tenant_db(getattr(obj1, "tenant", None)) != tenant_db(getattr(obj2, "tenant", None)):
+                return False
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
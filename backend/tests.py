@@ -0,0 +1,634 @@
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from accounts.models import User
+from accounts.signals import user_signed_up
+from backend import checks, ids, jobs, middleware, pooling, routers, throttling
+from backend.archive import archive_deleted
+from backend.metrics import registry
+from backend.models import ArchivedRow, IdCounter, Job
+from backend.tenancy import use_tenant
+from backend.throttling import reset_buckets
+from rbac.models import Permission, Role, RolePermission, UserRole
+from tasks.models import Task
+
+
+@override_settings(ID_BLOCK_SIZE=10)
+class IdAllocatorTestCase(TestCase):
+
+    def setUp(self):
+        ids._blocks.clear()
+
+    def test_ids_come_from_reserved_block(self):
+        self.assertEqual(ids.allocate_ids("test"), [1])
+        with self.assertNumQueries(0):
+            self.assertEqual(ids.allocate_ids("test", 3), [2, 3, 4])
+        self.assertEqual(IdCounter.objects.get(name="test").next_value, 11)
+
+    def test_bulk_allocation_spans_blocks(self):
+        self.assertEqual(ids.allocate_ids("test", 25), list(range(1, 26)))
+        self.assertEqual(ids.allocate_ids("test"), [26])
+
+    def test_blocks_are_not_shared_between_workers(self):
+        first = ids.allocate_ids("test", 2)
+        ids._blocks.clear()
+        second = ids.allocate_ids("test", 2)
+        self.assertFalse(set(first) & set(second))
+
+    def test_counter_seeded_from_existing_codes(self):
+        Task.all_objects.create(title="old", task_id="TK9")
+        Task.all_objects.create(title="old", task_id="TK10")
+        ids._blocks.clear()
+        IdCounter.objects.filter(name="tasks.task.task_id").delete()
+
+        self.assertEqual(Task.objects.create(title="new").task_id, "TK11")
+
+    def test_user_ids(self):
+        first = User.objects.create_user(email="a@test.com", username="a", password="x")
+        second = User.objects.create_user(email="b@test.com", username="b", password="x")
+        self.assertEqual(int(second.user_id[3:]), int(first.user_id[3:]) + 1)
+
+
+@override_settings(ID_BLOCK_SIZE=10)
+class IdReservationTestCase(TransactionTestCase):
+
+    def setUp(self):
+        ids._blocks.clear()
+
+    def test_block_survives_a_rolled_back_caller(self):
+        #sqlite reserves on the caller's connection, the own-connection path is
+        #what every other backend takes
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                self.assertEqual(ids.allocate_ids("test", 2), [1, 2])
+                1 / 0
+        self.assertEqual(IdCounter.objects.get(name="test").next_value, 11)
+
+        #another worker, or this one after losing its block, starts after it
+        ids._blocks.clear()
+        self.assertEqual(ids.allocate_ids("test"), [11])
+
+
+class SharedCacheCheckTestCase(TestCase):
+
+    def test_process_local_cache_fails_deploy_check(self):
+        with override_settings(DEBUG=False):
+            errors = checks.check_shared_caches(None)
+        self.assertEqual({e.id for e in errors}, {"backend.E001"})
+        self.assertEqual(len(errors), len(checks.SHARED_CACHE_SETTINGS))
+
+        shared = {**settings.CACHES, "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        aliases = {name: "shared" for name in checks.SHARED_CACHE_SETTINGS}
+        with override_settings(DEBUG=False, CACHES=shared, **aliases):
+            self.assertEqual(checks.check_shared_caches(None), [])
+        with override_settings(DEBUG=True):
+            self.assertEqual(checks.check_shared_caches(None), [])
+        with override_settings(DEBUG=False, TASKS_RESPONSE_CACHE=False):
+            self.assertNotIn("TASKS_CACHE_ALIAS", str(checks.check_shared_caches(None)))
+
+
+class AuditQueryPlansTestCase(TestCase):
+
+    def test_api_queries_use_indexes(self):
+        out = StringIO()
+        call_command("audit_query_plans", "--seed-tasks", "200", stdout=out)
+        self.assertIn("All query plans use indexes", out.getvalue())
+        self.assertEqual(Task.objects.count(), 0)
+
+    def test_detects_sequential_scan(self):
+        from backend.management.commands.audit_query_plans import postgres_seq_scans, sqlite_seq_scans
+
+        self.assertEqual(sqlite_seq_scans("2 0 0 SCAN tasks_task", ["tasks_task"]), ["tasks_task"])
+        self.assertEqual(sqlite_seq_scans("2 0 0 SEARCH tasks_task USING INDEX task_live_owner_idx (owner_id=?)", ["tasks_task"]), [])
+
+        plan = {"Node Type": "Limit", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "tasks_task"}]}
+        self.assertEqual(postgres_seq_scans(plan, ["tasks_task"]), ["tasks_task"])
+
+
+class BenchmarkTestCase(TestCase):
+
+    def test_seed_and_benchmark(self):
+        call_command("seed_data", "--users", "5", "--tasks", "50", "--seed", "1", stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 50)
+
+        with tempfile.NamedTemporaryFile("r", suffix=".json") as fh:
+            call_command(
+                "benchmark_api", "--requests", "3", "--scenarios", "list,detail,create",
+                "--output", fh.name, stdout=StringIO()
+            )
+            report = json.load(fh)
+
+        self.assertEqual(set(report["scenarios"]), {"list", "detail", "create"})
+        for row in report["scenarios"].values():
+            self.assertEqual(row["errors"], 0)
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+            self.assertGreater(row["queries_per_request"], 0)
+
+        #client runs roll their writes back
+        self.assertEqual(Task.objects.count(), 50)
+
+    def test_compare_flags_regressions(self):
+        from backend.benchmark import compare
+
+        rows = compare({"list": {"p95_ms": 12.0}}, {"list": {"p95_ms": 10.0}}, threshold=10)
+        self.assertEqual(rows, [("list", "p95_ms", 10.0, 12.0, 20.0, True)])
+
+
+class MetricsTestCase(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.user = User.objects.create_user(email="user@test.com", username="user", password="user123")
+        role = Role.objects.create(name="User")
+        RolePermission.objects.create(role=role, permission=Permission.objects.create(code="task.view"))
+        UserRole.objects.create(user=self.user, role=role)
+        Task.objects.create(title="Task", owner=self.user)
+
+        reset_buckets()
+        self.client = APIClient()
+        token = self.client.post("/api/auth/token/", {"email": "user@test.com", "password": "user123"}).data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_request_metrics_exposed(self):
+        self.client.get("/api/tasks/task/")
+
+        body = self.client.get("/metrics/").content.decode()
+        labels = '{method="GET",view="TaskCreateAPIView"}'
+        self.assertIn(f"http_request_duration_ms_count{labels} 1", body)
+        self.assertIn('http_requests_total{method="GET",status="200",view="TaskCreateAPIView"} 1', body)
+        self.assertIn('db_queries_per_request_count{view="TaskCreateAPIView"} 1', body)
+        self.assertIn('serializer_duration_ms_count{view="TaskCreateAPIView"} 1', body)
+        self.assertIn('permission_check_duration_ms_count{view="TaskCreateAPIView"} 1', body)
+        self.assertIn('http_requests_total{method="POST",status="200",view="CustomTokenObtainView"} 1', body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        client = APIClient()
+        self.assertEqual(client.get("/metrics/").status_code, 403)
+        res = client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(res.status_code, 200)
+
+    def test_connection_and_pool_metrics(self):
+        connection_created.send(sender=type(connection), connection=connection)
+        stats = dict.fromkeys(pooling.POOL_STATS, 0)
+        stats.update(pool_max=10, pool_size=4, pool_available=3)
+
+        with mock.patch("backend.pooling.pool_stats", return_value=stats):
+            body = self.client.get("/metrics/").content.decode()
+        self.assertIn('db_connections_opened_total{alias="default"} 1', body)
+        self.assertIn('db_pool_pool_size{alias="default"} 4', body)
+        self.assertIn('db_pool_pool_available{alias="default"} 3', body)
+
+    def test_pool_stats_skip_unpooled_aliases(self):
+        self.assertIsNone(pooling.pool_stats("default"))
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_log_includes_sql(self):
+        with self.assertLogs("backend.slow_requests", "WARNING") as logs:
+            self.client.get("/api/tasks/task/")
+        self.assertIn("TaskCreateAPIView", logs.output[0])
+        self.assertIn('FROM "tasks_task"', logs.output[0])
+
+
+class ArchiveTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@test.com", username="owner", password="pw")
+        self.assignee = User.objects.create_user(email="assignee@test.com", username="assignee", password="pw")
+        self.task = Task.objects.create(title="Old", owner=self.owner)
+        self.task.assigned_users.add(self.assignee)
+        self.live = Task.objects.create(title="Live", owner=self.owner)
+
+    def age(self, instance, days=100):
+        instance.delete()
+        type(instance).all_objects.filter(pk=instance.pk).update(deleted_at=timezone.now() - timedelta(days=days))
+
+    def test_archives_old_deleted_rows_only(self):
+        self.age(self.task)
+        recent = Task.objects.create(title="Recent", owner=self.owner)
+        recent.delete()
+
+        call_command("archive_deleted", "--days", "90", stdout=StringIO())
+
+        self.assertFalse(Task.all_objects.filter(pk=self.task.pk).exists())
+        self.assertTrue(Task.all_objects.filter(pk=recent.pk).exists())
+        archived = ArchivedRow.objects.get(model="tasks.task", object_pk=str(self.task.pk))
+        self.assertEqual(archived.payload["fields"]["assigned_users"], [self.assignee.pk])
+
+    def test_restore_archived_row(self):
+        created_at = Task.all_objects.get(pk=self.task.pk).created_at
+        self.age(self.task)
+        archive_deleted(days=90)
+
+        task = Task.restore_archived(self.task.pk)
+        task = Task.objects.get(pk=task.pk)
+        self.assertEqual(task.task_id, self.task.task_id)
+        self.assertEqual(task.created_at, created_at)
+        self.assertEqual(list(task.assigned_users.all()), [self.assignee])
+        self.assertFalse(ArchivedRow.objects.exists())
+
+    def test_referenced_rows_are_kept(self):
+        self.age(self.assignee)
+        archive_deleted(days=90)
+        #still assigned to a task
+        self.assertTrue(User.all_objects.filter(pk=self.assignee.pk).exists())
+
+        self.age(self.task)
+        archive_deleted(days=90)
+        self.assertFalse(User.all_objects.filter(pk=self.assignee.pk).exists())
+
+    def test_restore_brings_back_archived_parents_soft_deleted(self):
+        self.age(self.task)
+        self.age(self.assignee)
+        archive_deleted(days=90)
+
+        Task.restore_archived(self.task.pk)
+        assignee = User.all_objects.get(pk=self.assignee.pk)
+        self.assertTrue(assignee.is_deleted)
+        self.assertEqual(list(Task.objects.get(pk=self.task.pk).assigned_users.all()), [assignee])
+
+    def test_batches_and_dry_run(self):
+        for task in [self.task, self.live]:
+            self.age(task)
+
+        out = StringIO()
+        call_command("archive_deleted", "--dry-run", "--models", "tasks.Task", stdout=out)
+        self.assertIn("tasks.Task: 2 to archive", out.getvalue())
+
+        self.assertEqual(archive_deleted(days=90, batch_size=1, models=[Task]), {"tasks.Task": 2})
+
+
+class JobQueueTestCase(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        jobs.handlers["test.record"] = lambda value: self.calls.append(value)
+        jobs.handlers["test.fail"] = lambda: 1 / 0
+        self.addCleanup(jobs.handlers.pop, "test.record")
+        self.addCleanup(jobs.handlers.pop, "test.fail")
+
+    def test_enqueued_jobs_run_once(self):
+        jobs.enqueue("test.record", value=1)
+        jobs.enqueue("test.record", value=2)
+        jobs.enqueue("test.record", delay=60, value=3)
+
+        call_command("run_jobs", "--once", stdout=StringIO())
+        self.assertEqual(self.calls, [1, 2])
+        self.assertEqual(Job.objects.get().payload, {"value": 3})
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue("test.fail")
+        self.assertEqual(jobs.run_pending(), (0, 1))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("ZeroDivisionError", job.last_error)
+        self.assertEqual(jobs.run_pending(), (0, 0))
+
+        with override_settings(JOBS_MAX_ATTEMPTS=2), self.assertLogs("backend.jobs", "ERROR"):
+            Job.objects.update(run_after=timezone.now())
+            jobs.run_pending()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_stale_running_jobs_are_reclaimed(self):
+        jobs.enqueue("test.record", value=1)
+        Job.objects.update(status=Job.RUNNING, locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.run_pending(), (1, 0))
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue("test.missing")
+
+
+@override_settings(DATABASE_REPLICAS=["default"])
+class ReplicaRoutingTestCase(TestCase):
+
+    #the primary doubles as the replica alias, pick_replica records whether a read was routed to it
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="user@test.com", username="user", password="user123")
+        role = Role.objects.create(name="User")
+        for code in ["task.view", "task.update"]:
+            RolePermission.objects.create(role=role, permission=Permission.objects.create(code=code))
+        UserRole.objects.create(user=self.user, role=role)
+        self.task = Task.objects.create(title="Task", owner=self.user)
+
+        reset_buckets()
+        self.client = APIClient()
+        token = self.client.post("/api/auth/token/", {"email": "user@test.com", "password": "user123"}).data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.unpin()
+
+        patcher = mock.patch("backend.routers.pick_replica", side_effect=lambda aliases: aliases[0])
+        self.pick_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def unpin(self):
+        self.client.cookies.pop(routers.PIN_COOKIE, None)
+        routers.get_cache().clear()
+
+    def test_router_decisions(self):
+        router = routers.ReplicaRouter()
+        state = routers.RoutingState()
+        token = routers.routing_state.set(state)
+        self.addCleanup(routers.routing_state.reset, token)
+
+        with override_settings(DATABASE_REPLICAS=["replica"]), \
+                mock.patch("backend.routers.in_primary_transaction", return_value=False):
+            self.assertEqual(router.db_for_read(Task), "default")
+            with routers.replica_reads():
+                self.assertEqual(router.db_for_read(Task), "replica")
+                self.assertEqual(router.db_for_write(Task), "default")
+                #read-your-writes inside the request
+                self.assertEqual(router.db_for_read(Task), "default")
+
+            pinned = routers.RoutingState(pinned=True)
+            routers.routing_state.set(pinned)
+            with routers.replica_reads():
+                self.assertEqual(router.db_for_read(Task), "default")
+
+            self.assertFalse(router.allow_migrate("replica", "tasks"))
+
+    async def test_async_requests_pin_with_async_cache_calls(self):
+        async def write(request):
+            routers.routing_state.get().wrote = True
+            return HttpResponse()
+
+        async def read(request):
+            return HttpResponse(str(routers.routing_state.get().pinned))
+
+        request = RequestFactory().get("/")
+        request.user = self.user
+        with mock.patch("backend.middleware.is_pinned", side_effect=AssertionError("sync cache call")), \
+                mock.patch("backend.middleware.pin", side_effect=AssertionError("sync cache call")):
+            response = await middleware.ReplicaPinMiddleware(write)(request)
+            self.assertIn(routers.PIN_COOKIE, response.cookies)
+            #pinned by account, the request carries no cookie
+            self.assertEqual((await middleware.ReplicaPinMiddleware(read)(request)).content, b"True")
+
+    def test_reads_use_replica_until_client_writes(self):
+        self.client.get("/api/tasks/task/")
+        self.assertEqual(self.pick_replica.call_count, 1)
+
+        res = self.client.patch(f"/api/tasks/{self.task.task_id}/", {"title": "Changed"}, format="json")
+        self.assertIn(routers.PIN_COOKIE, res.cookies)
+
+        #pinned by cookie
+        self.assertEqual(self.client.get(f"/api/tasks/{self.task.task_id}/").data["title"], "Changed")
+        self.assertEqual(self.pick_replica.call_count, 1)
+
+        #pinned by account, e.g. another device without the cookie
+        self.client.cookies.pop(routers.PIN_COOKIE)
+        self.client.get("/api/tasks/task/")
+        self.assertEqual(self.pick_replica.call_count, 1)
+
+        self.unpin()
+        self.client.get("/api/tasks/task/?page=1")
+        self.assertEqual(self.pick_replica.call_count, 2)
+
+    def test_recent_writes_are_not_cached_from_replica(self):
+        Task.objects.create(title="Other", owner=self.user)
+
+        #a lagging replica could still return the old rows, so nothing is cached yet
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get("/api/tasks/task/")
+            self.assertTrue([q for q in ctx.captured_queries if 'FROM "tasks_task"' in q["sql"]])
+
+        routers.get_cache().delete(routers.recent_key("tasks"))
+        self.client.get("/api/tasks/task/")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/tasks/task/")
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "tasks_task"' in q["sql"]])
+
+
+class ThrottledView(APIView):
+    authentication_classes = []
+    permission_classes = []
+    throttle_scope = "ping"
+    throttle_rates = {"ip": "3/min"}
+
+    def post(self, request):
+        return Response({"ok": True})
+
+
+class ThrottleTestCase(TestCase):
+
+    def setUp(self):
+        reset_buckets()
+        self.factory = APIRequestFactory()
+
+    def hit(self, view, address="10.0.0.1"):
+        return view(self.factory.post("/ping/", {}, REMOTE_ADDR=address)).status_code
+
+    def test_view_rates_override_settings(self):
+        view = ThrottledView.as_view()
+        self.assertEqual([self.hit(view) for _ in range(4)], [200, 200, 200, 429])
+        self.assertEqual(self.hit(view, "10.0.0.2"), 200)
+
+        #no rate for the scope means no limit
+        unlimited = ThrottledView.as_view(throttle_rates={})
+        self.assertEqual({self.hit(unlimited) for _ in range(10)}, {200})
+
+    def test_take_refills_up_to_capacity(self):
+        capacity, refill = throttling.parse_rate("6/min")
+        self.assertEqual((capacity, refill), (6, 0.1))
+
+        allowed, state = throttling.take(None, capacity, refill, 100.0)
+        self.assertEqual((allowed, state), (True, (5, 100.0)))
+        allowed, state = throttling.take((0.5, 100.0), capacity, refill, 103.0)
+        self.assertFalse(allowed)
+        allowed, state = throttling.take((0.5, 100.0), capacity, refill, 1000.0)
+        self.assertEqual((allowed, state), (True, (5, 1000.0)))
+
+    @override_settings(THROTTLE_CACHE_ALIAS="default")
+    def test_shared_cache_buckets(self):
+        self.addCleanup(throttling.caches["default"].clear)
+        view = ThrottledView.as_view()
+        self.assertEqual([self.hit(view) for _ in range(4)], [200, 200, 200, 429])
+
+        #another worker sees the same bucket, the process-local store was never used
+        throttling.reset_buckets()
+        self.assertEqual(self.hit(view), 429)
+
+
+class TenantFixtureMixin:
+
+    def create_tenant_user(self, tenant, email, codes=("task.view", "task.create")):
+        with use_tenant(tenant):
+            user = User.objects.create_user(email=email, username=email.split("@")[0], password="user123")
+            role = Role.objects.get_or_create(name="User")[0]
+            for code in codes:
+                permission = Permission.objects.get_or_create(code=code)[0]
+                RolePermission.objects.get_or_create(role=role, permission=permission)
+            UserRole.objects.create(user=user, role=role)
+        return user
+
+    def login(self, tenant, email):
+        client = APIClient(HTTP_X_TENANT=tenant)
+        res = client.post("/api/auth/token/", {"email": email, "password": "user123"})
+        self.assertEqual(res.status_code, 200)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+        return client
+
+
+@override_settings(TENANTS={"public": "default", "small": "default"})
+class TenancyTestCase(TenantFixtureMixin, TestCase):
+
+    #two tenants sharing the default database
+
+    def setUp(self):
+        caches["default"].clear()
+        reset_buckets()
+        self.public = self.create_tenant_user("public", "public@test.com")
+        self.small = self.create_tenant_user("small", "small@test.com")
+
+    def test_managers_and_api_are_scoped(self):
+        with use_tenant("small"):
+            Task.objects.create(title="Small task", owner=self.small)
+        Task.objects.create(title="Public task", owner=self.public)
+
+        self.assertEqual(list(Task.objects.values_list("title", flat=True)), ["Public task"])
+        self.assertEqual(Task.all_objects.count(), 2)
+        self.assertFalse(User.objects.filter(pk=self.small.pk).exists())
+
+        client = self.login("small", "small@test.com")
+        res = client.post("/api/tasks/task/", {"title": "From api"}, format="json")
+        self.assertEqual(Task.all_objects.get(task_id=res.data["task_id"]).tenant, "small")
+
+        titles = [row["title"] for row in client.get("/api/tasks/task/").data["results"]]
+        self.assertEqual(sorted(titles), ["From api", "Small task"])
+
+    def test_login_and_tokens_stay_in_their_tenant(self):
+        wrong = APIClient(HTTP_X_TENANT="public")
+        res = wrong.post("/api/auth/token/", {"email": "small@test.com", "password": "user123"})
+        self.assertEqual(res.status_code, 401)
+
+        client = self.login("small", "small@test.com")
+        client.defaults["HTTP_X_TENANT"] = "public"
+        res = client.get("/api/tasks/task/")
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(str(res.data["detail"]), "Token belongs to another tenant.")
+
+    def test_unknown_tenant(self):
+        res = APIClient(HTTP_X_TENANT="nope").get("/api/tasks/task/")
+        self.assertEqual(res.status_code, 404)
+        with self.assertRaises(CommandError):
+            call_command("run_jobs", "--once", "--tenant", "nope", stdout=StringIO())
+
+    def test_cache_keys_carry_the_database(self):
+        cache = caches["default"]
+        with use_tenant("small"):
+            cache.set("shared-name", "small")
+            cache.set("throttle:shared", "small")
+        self.assertEqual(cache.get("shared-name"), "small")
+
+        with self.settings(TENANTS={"public": "default", "small": "default", "big": "tenant_big"}), use_tenant("big"):
+            self.assertIsNone(cache.get("shared-name"))
+            #throttle buckets ignore the tenant a client names
+            self.assertEqual(cache.get("throttle:shared"), "small")
+
+    def test_same_email_in_two_tenants(self):
+        #a public user's address is neither taken nor revealed in "small"
+        signup = {"email": "public@test.com", "username": "public", "password": "secret123"}
+        res = APIClient(HTTP_X_TENANT="small").post("/api/accounts/signup/", signup)
+        self.assertEqual(res.status_code, 201)
+        res = APIClient(HTTP_X_TENANT="small").post("/api/accounts/signup/", signup)
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("email", res.data)
+        self.assertIn("username", res.data)
+
+        self.login("public", "public@test.com")
+        client = APIClient(HTTP_X_TENANT="small")
+        res = client.post("/api/auth/token/", {"email": "public@test.com", "password": "secret123"})
+        self.assertEqual(res.status_code, 200)
+
+    def test_same_email_authenticates_to_its_tenants_user(self):
+        with use_tenant("small"):
+            twin = User.objects.create_user(email="public@test.com", username="public", password="small123")
+
+        with use_tenant("public"):
+            self.assertEqual(authenticate(email="public@test.com", password="user123"), self.public)
+            self.assertIsNone(authenticate(email="public@test.com", password="small123"))
+        with use_tenant("small"):
+            self.assertEqual(authenticate(email="public@test.com", password="small123"), twin)
+            self.assertIsNone(authenticate(email="public@test.com", password="user123"))
+
+    def test_permission_changes_reach_tenants_on_the_same_database(self):
+        client = self.login("small", "small@test.com")
+        res = client.post("/api/tasks/task/", {"title": "Before"}, format="json")
+        self.assertEqual(res.status_code, 201)
+
+        #revoked while serving "public", the rbac rows are shared with "small"
+        RolePermission.objects.get(permission__code="task.create").delete()
+        res = client.post("/api/tasks/task/", {"title": "After"}, format="json")
+        self.assertEqual(res.status_code, 403)
+
+    def test_queries_filter_on_the_leading_index_column(self):
+        with CaptureQueriesContext(connection) as ctx:
+            list(Task.objects.order_by("-created_at", "-id")[:10])
+        self.assertIn('"tasks_task"."tenant" = \'public\'', ctx.captured_queries[0]["sql"])
+
+
+SHARDED = "tenant_big" in settings.DATABASES
+
+
+@skipUnless(SHARDED, "needs a second database, run with --settings=backend.settings_sqlite")
+class ShardedTenancyTestCase(TenantFixtureMixin, TestCase):
+
+    #"big" lives in its own database, user and task pks repeat across the two
+    databases = {"default", "tenant_big"} if SHARDED else {"default"}
+
+    def setUp(self):
+        caches["default"].clear()
+        reset_buckets()
+        self.public = self.create_tenant_user("public", "user@test.com")
+        self.big = self.create_tenant_user("big", "user@test.com")
+
+    def test_rows_live_in_the_tenant_database(self):
+        self.assertEqual(self.public.pk, self.big.pk)
+        self.assertEqual(self.big._state.db, "tenant_big")
+
+        client = self.login("big", "user@test.com")
+        res = client.post("/api/tasks/task/", {"title": "Big task"}, format="json")
+        self.assertEqual(res.status_code, 201)
+
+        self.assertTrue(Task.all_objects.using("tenant_big").filter(title="Big task").exists())
+        self.assertFalse(Task.all_objects.using("default").exists())
+
+        public = self.login("public", "user@test.com")
+        self.assertEqual(public.get("/api/tasks/task/").data["results"], [])
+        self.assertEqual(len(client.get("/api/tasks/task/").data["results"]), 1)
+
+    def test_signup_and_jobs_run_against_the_tenant_database(self):
+        user_signed_up.connect(lambda sender, user, **kwargs: None, weak=False, dispatch_uid="test")
+        self.addCleanup(user_signed_up.disconnect, dispatch_uid="test")
+
+        res = APIClient(HTTP_X_TENANT="big").post(
+            "/api/accounts/signup/", {"email": "new@test.com", "username": "new", "password": "secret123"}
+        )
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(User.all_objects.using("tenant_big").filter(email="new@test.com").exists())
+        self.assertEqual(Job.objects.using("tenant_big").count(), 1)
+        self.assertFalse(Job.objects.using("default").exists())
+
+        call_command("run_jobs", "--once", "--tenant", "big", stdout=StringIO())
+        self.assertFalse(Job.objects.using("tenant_big").exists())
@@ -0,0 +1,158 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import ParseError
+from rest_framework.throttling import BaseThrottle
+
+from backend.metrics import registry
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+
+    #"10/min" -> (capacity 10, refill 10/60 tokens a second), None -> unlimited
+    if rate is None:
+        return None
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period.strip()[0]]
+
+
+def take(state, capacity, refill, now):
+
+    #state is (tokens, stamp) or None for a full bucket, returns (allowed, new state)
+    tokens, stamp = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * refill)
+    if tokens >= 1:
+        return True, (tokens - 1, now)
+    return False, (tokens, now)
+
+
+class MemoryBuckets:
+
+    #per process, bounded, evicting a bucket only refills it
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill):
+        now = time.monotonic()
+        with self._lock:
+            allowed, state = take(self._data.get(key), capacity, refill, now)
+            self._data[key] = state
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return allowed, state[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CacheBuckets:
+
+    #shared between workers, get/set is not atomic so concurrent workers may
+    #each spend the same token, close enough to cap a burst
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, capacity, refill):
+        cache = caches[self.alias]
+        now = time.time()
+        allowed, state = take(cache.get(key), capacity, refill, now)
+        #a bucket left alone this long is full again anyway
+        cache.set(key, state, int(capacity / refill) + 1)
+        return allowed, state[0]
+
+    def clear(self):
+        pass
+
+
+_memory = MemoryBuckets(getattr(settings, "THROTTLE_MAX_BUCKETS", 100000))
+
+
+def get_buckets():
+    alias = getattr(settings, "THROTTLE_CACHE_ALIAS", None)
+    if alias is None:
+        return _memory
+    return CacheBuckets(alias)
+
+
+def reset_buckets():
+
+    #tests log in from one address far faster than the login rate allows
+    _memory.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+
+    #one bucket per scope and identity, no database access. the rate comes from
+    #view.throttle_rates[kind], else settings.THROTTLE_RATES[view.throttle_scope][kind]
+    kind = None
+
+    def get_rate(self, view):
+        scope = getattr(view, "throttle_scope", None) or "default"
+        rates = getattr(view, "throttle_rates", None)
+        if rates is None:
+            rates = getattr(settings, "THROTTLE_RATES", {}).get(scope, {})
+        return scope, rates.get(self.kind)
+
+    def get_ident_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope, rate = self.get_rate(view)
+        parsed = parse_rate(rate)
+        if parsed is None:
+            return True
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+
+        capacity, refill = parsed
+        digest = hashlib.sha1(str(ident).encode()).hexdigest()
+        allowed, tokens = get_buckets().consume(f"throttle:{scope}:{self.kind}:{digest}", capacity, refill)
+        if not allowed:
+            self.wait_seconds = (1 - tokens) / refill
+            registry.increment("throttled_requests_total", scope=scope, kind=self.kind)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottle(TokenBucketThrottle):
+
+    #client address, honours REST_FRAMEWORK["NUM_PROXIES"]
+    kind = "ip"
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class AccountThrottle(TokenBucketThrottle):
+
+    #the signed-in user, or the email a login/signup is attempted for
+    kind = "account"
+
+    def get_ident_key(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.tenant}:{user.pk}"
+        try:
+            data = request.data
+        except ParseError:
+            return None
+        email = data.get("email") if hasattr(data, "get") else None
+        if not isinstance(email, str) or not email:
+            return None
+        return f"email:{email.strip().lower()}"
@@ -3,6 +3,7 @@ from django.urls import include, path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.http import JsonResponse
 from login.views import CustomTokenObtainView
+from backend.views import metrics
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
 
@@ -25,7 +26,11 @@ urlpatterns = [
     
     #tasks
     path("api/tasks/", include("tasks.urls")),
+    path("api/async/tasks/", include("tasks.async_urls")),
     
+    #instrumentation
+    path("metrics/", metrics, name="metrics"),
+
     #docs
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
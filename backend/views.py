@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from backend.metrics import registry
+from backend.pooling import record_pool_stats
+
+
+def metrics(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+    record_pool_stats()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,86 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from backend.tenancy import get_current_tenant
+from login.sessions import aget_session_token, get_session_token
+
+
+class SessionJWTAuthentication(JWTAuthentication):
+
+    #SessionJWTMiddleware authenticates first and leaves the result on the
+    #request, so the token is decoded and the user loaded once per request
+
+    def authenticate(self, request):
+        django_request = getattr(request, "_request", request)
+        if hasattr(django_request, "_jwt_auth"):
+            result = django_request._jwt_auth
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return self.authenticate_token(request)
+
+    def get_token(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        return self.get_validated_token(raw_token)
+
+    def get_user_id(self, token):
+        try:
+            return token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    def check_tenant(self, token):
+        #user pks repeat across tenant databases, a token only works in its own tenant
+        tenant = token.get("tenant")
+        if tenant is not None and tenant != get_current_tenant():
+            raise AuthenticationFailed("Token belongs to another tenant.")
+
+    def authenticate_token(self, request):
+        token = self.get_token(request)
+        if token is None:
+            return None
+        self.check_tenant(token)
+
+        #session check before the user lookup, stale tokens never reach the db
+        jwt_session = token.get("session")
+        if jwt_session and str(jwt_session) != get_session_token(self.get_user_id(token)):
+            raise AuthenticationFailed("Session expired. Logged in elsewhere.")
+
+        return self.get_user(token), token
+
+    async def aauthenticate_token(self, request):
+        token = self.get_token(request)
+        if token is None:
+            return None
+        self.check_tenant(token)
+
+        jwt_session = token.get("session")
+        if jwt_session and str(jwt_session) != await aget_session_token(self.get_user_id(token)):
+            raise AuthenticationFailed("Session expired. Logged in elsewhere.")
+
+        return await self.aget_user(token), token
+
+    async def aget_user(self, token):
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: self.get_user_id(token)})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        return user
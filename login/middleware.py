@@ -1,26 +1,42 @@
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.utils.deprecation import MiddlewareMixin
 
+from login.authentication import SessionJWTAuthentication
+
 
 class SessionJWTMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
-        auth = JWTAuthentication()
+        auth = SessionJWTAuthentication()
 
         try:
-            user_auth = auth.authenticate(request)
-        except:
+            user_auth = auth.authenticate_token(request)
+        except AuthenticationFailed as exc:
+            #re-raised by DRF so the client gets a proper 401
+            request._jwt_auth = exc
             return None
 
-        if user_auth is None:
-            return None
+        self.set_user(request, user_auth)
 
-        user, token = user_auth
+    async def __acall__(self, request):
+
+        #under ASGI the token and user are resolved without a thread hop
+        auth = SessionJWTAuthentication()
 
-        jwt_session = token.get("session")
+        try:
+            user_auth = await auth.aauthenticate_token(request)
+        except AuthenticationFailed as exc:
+            request._jwt_auth = exc
+        else:
+            self.set_user(request, user_auth)
 
-        if jwt_session and str(jwt_session) != str(user.session_token):
-            raise AuthenticationFailed("Session expired. Logged in elsewhere.")
+        return await self.get_response(request)
 
+    def set_user(self, request, user_auth):
+        request._jwt_auth = user_auth
+
+        if user_auth is None:
+            return None
+
+        user, token = user_auth
         request.user = user
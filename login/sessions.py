@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from accounts.models import User
+
+
+def get_cache():
+    return caches[getattr(settings, "SESSION_TOKEN_CACHE_ALIAS", "default")]
+
+
+def session_key(user_id):
+    return f"login:session:{user_id}"
+
+
+def session_timeout():
+    return getattr(settings, "SESSION_TOKEN_CACHE_TIMEOUT", 3600)
+
+
+def set_session_token(user_id, session_token):
+    get_cache().set(session_key(user_id), str(session_token), session_timeout())
+
+
+def get_session_token(user_id):
+
+    #current session of a user, from the cache when possible
+    session_token = get_cache().get(session_key(user_id))
+    if session_token is None:
+        session_token = User.objects.filter(pk=user_id).values_list("session_token", flat=True).first()
+        if session_token is None:
+            return None
+        set_session_token(user_id, session_token)
+    return str(session_token)
+
+
+async def aget_session_token(user_id):
+    session_token = await get_cache().aget(session_key(user_id))
+    if session_token is None:
+        session_token = await User.objects.filter(pk=user_id).values_list("session_token", flat=True).afirst()
+        if session_token is None:
+            return None
+        await get_cache().aset(session_key(user_id), str(session_token), session_timeout())
+    return str(session_token)
@@ -1,3 +1,127 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from backend.metrics import registry
+from backend.throttling import reset_buckets
+from login.sessions import aget_session_token, get_cache, session_key
+from rbac.models import Role, Permission, RolePermission, UserRole
+
+
+class SessionJWTTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@test.com",
+            username="user",
+            password="user123"
+        )
+        role = Role.objects.create(name="User")
+        RolePermission.objects.create(role=role, permission=Permission.objects.create(code="task.view"))
+        UserRole.objects.create(user=self.user, role=role)
+        reset_buckets()
+
+    def login(self):
+        res = self.client.post("/api/auth/token/", {"email": "user@test.com", "password": "user123"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def get_tasks(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        return self.client.get("/api/tasks/task/")
+
+    def test_user_loaded_once_per_request(self):
+        access = self.login()["access"]
+        self.get_tasks(access)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.get_tasks(access)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        user_queries = [q for q in ctx.captured_queries if 'FROM "accounts_user" WHERE' in q["sql"]]
+        self.assertEqual(len(user_queries), 1)
+
+    def test_new_login_expires_old_session(self):
+        old = self.login()
+        new = self.login()
+        self.assertNotEqual(old["session"], new["session"])
+
+        res = self.get_tasks(old["access"])
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(str(res.data["detail"]), "Session expired. Logged in elsewhere.")
+
+        self.assertEqual(self.get_tasks(new["access"]).status_code, status.HTTP_200_OK)
+
+    def test_last_login_follows_setting(self):
+        self.login()
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+        with override_settings(SIMPLE_JWT={"UPDATE_LAST_LOGIN": True}):
+            with CaptureQueriesContext(connection) as ctx:
+                self.login()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertEqual(len([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]), 1)
+
+    async def test_async_session_lookup_fills_cache_with_async_calls(self):
+        await get_cache().adelete(session_key(self.user.pk))
+        with mock.patch("login.sessions.set_session_token", side_effect=AssertionError("sync cache call")):
+            session = await aget_session_token(self.user.pk)
+        self.assertEqual(session, str(self.user.session_token))
+        self.assertEqual(await get_cache().aget(session_key(self.user.pk)), session)
+
+    def test_refreshed_token_keeps_session(self):
+        tokens = self.login()
+        res = self.client.post("/api/auth/token/refresh/", {"refresh": tokens["refresh"]})
+        self.assertEqual(self.get_tasks(res.data["access"]).status_code, status.HTTP_200_OK)
+
+        self.login()
+        res = self.client.post("/api/auth/token/refresh/", {"refresh": tokens["refresh"]})
+        self.assertEqual(self.get_tasks(res.data["access"]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(THROTTLE_RATES={"login": {"ip": "5/min", "account": "2/min"}})
+class LoginThrottleTestCase(APITestCase):
+
+    def setUp(self):
+        User.objects.create_user(email="user@test.com", username="user", password="user123")
+        reset_buckets()
+        registry.clear()
+
+    def attempt(self, email, password="wrong"):
+        return self.client.post("/api/auth/token/", {"email": email, "password": password})
+
+    def test_account_bucket_stops_hashing(self):
+        for _ in range(2):
+            self.assertEqual(self.attempt("user@test.com").status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with mock.patch("django.contrib.auth.backends.ModelBackend.authenticate") as authenticate:
+            with self.assertNumQueries(0):
+                res = self.attempt("User@Test.com ", "user123")
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", res.headers)
+        authenticate.assert_not_called()
+        self.assertIn('throttled_requests_total{kind="account",scope="login"} 1', registry.render())
+
+        #other accounts are still open until the address runs out
+        self.assertEqual(self.attempt("other@test.com").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ip_bucket_spans_accounts(self):
+        for n in range(5):
+            self.assertEqual(self.attempt(f"user{n}@test.com").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.attempt("user@test.com", "user123").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_bucket_refills(self):
+        with mock.patch("backend.throttling.time.monotonic", return_value=1000.0):
+            for _ in range(2):
+                self.attempt("user@test.com")
+            self.assertEqual(self.attempt("user@test.com").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        #2/min puts a token back every 30 seconds
+        with mock.patch("backend.throttling.time.monotonic", return_value=1030.0):
+            self.assertEqual(self.attempt("user@test.com", "user123").status_code, status.HTTP_200_OK)
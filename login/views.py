@@ -1,16 +1,41 @@
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
+from django.utils import timezone
 import uuid
 
+from backend.metrics import timed
+from login.sessions import set_session_token
+
+
 class CustomTokenObtainSerializer(TokenObtainPairSerializer):
 
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["session"] = str(user.session_token)
+        token["tenant"] = user.tenant
+        return token
+
     def validate(self, attrs):
-        data = super().validate(attrs)
+        #authenticate only, tokens are issued after the session is rotated
+        with timed("serializer"):
+            data = super(TokenObtainPairSerializer, self).validate(attrs)
         user = self.user
 
+        #the skipped TokenObtainPairSerializer.validate would update last_login on its own,
+        #SIMPLE_JWT["UPDATE_LAST_LOGIN"] folds it into the session write instead
+        fields = ["session_token"]
+        if getattr(settings, "SIMPLE_JWT", {}).get("UPDATE_LAST_LOGIN", False):
+            user.last_login = timezone.now()
+            fields.append("last_login")
         user.session_token = uuid.uuid4()
-        user.save(update_fields=["session_token"])
+        user.save(update_fields=fields)
+        set_session_token(user.pk, user.session_token)
 
+        refresh = self.get_token(user)
+        data["refresh"] = str(refresh)
+        data["access"] = str(refresh.access_token)
         data["session"] = str(user.session_token)
 
         return data
@@ -18,3 +43,5 @@ class CustomTokenObtainSerializer(TokenObtainPairSerializer):
 
 class CustomTokenObtainView(TokenObtainPairView):
     serializer_class = CustomTokenObtainSerializer
+    #checked before the password hash, see THROTTLE_RATES["login"]
+    throttle_scope = "login"
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 19:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbac', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rolepermission',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['role', 'permission'], name='roleperm_live_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userrole',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'role'], name='userrole_live_user_idx'),
+        ),
+    ]
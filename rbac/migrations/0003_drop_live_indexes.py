@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 21:04
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbac', '0002_live_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rolepermission',
+            name='roleperm_live_role_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='userrole',
+            name='userrole_live_user_idx',
+        ),
+    ]
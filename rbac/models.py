@@ -16,6 +16,7 @@ class UserRole(SoftDeleteModel):
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
 
     class Meta:
+        #the unique index also serves the permission lookup, is_deleted is filtered on the few rows it finds
         unique_together = ("user", "role")
 
     
@@ -32,4 +33,5 @@ class RolePermission(SoftDeleteModel):
     permission = models.ForeignKey(Permission, on_delete=models.CASCADE)
 
     class Meta:
+        #the unique index also serves the permission lookup
         unique_together = ("role", "permission")
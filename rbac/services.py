@@ -1,4 +1,177 @@
-from rbac.models import UserRole, RolePermission
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from backend.metrics import timed
+from backend.routers import mark_recent_write, replica_may_be_stale, replica_reads
+from backend.tenancy import tenant_db
+from rbac.models import Role, RolePermission
+
+
+VERSION_KEY = "rbac:version"
+DEFAULT_ROLE = "User"
+
+
+class PermissionLRU:
+
+    #entries expire after ttl seconds, which bounds how long a worker can miss a version bump
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local_cache = PermissionLRU(getattr(settings, "RBAC_LRU_SIZE", 1024), getattr(settings, "RBAC_LRU_SECONDS", 5))
+
+
+def get_cache():
+    return caches[getattr(settings, "RBAC_CACHE_ALIAS", "default")]
+
+
+def get_permission_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        #seed from the clock so an evicted counter never reuses an old version
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_permission_version():
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, int(time.time() * 1000), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_permission_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+    mark_recent_write("rbac")
+
+
+def role_id_key(name):
+    return f"rbac:role:{name}"
+
+
+def get_role_id(name=DEFAULT_ROLE):
+
+    #cleared by rbac.signals when a Role changes, not by the version bump
+    #every new UserRole causes
+    cache = get_cache()
+    role_id = cache.get(role_id_key(name))
+    if role_id is None:
+        role_id = Role.objects.values_list("pk", flat=True).get(name=name)
+        cache.set(role_id_key(name), role_id, None)
+    return role_id
+
+
+def user_permissions_query(user):
+    return RolePermission.objects.filter(
+        role__userrole__user=user,
+        role__userrole__is_deleted=False,
+        role__is_deleted=False,
+        permission__is_deleted=False,
+        is_deleted=False,
+    ).values_list("permission__code", flat=True)
+
+
+def load_user_permissions(user):
+    return frozenset(user_permissions_query(user))
+
+
+def permissions_cache_key(version, user_id):
+    return f"rbac:perms:{version}:{user_id}"
+
+
+def get_user_permissions(user):
+
+    #memoized on the request user, so one lookup per request
+    cached = getattr(user, "_rbac_permissions", None)
+    if cached is not None:
+        return cached
+
+    version = get_permission_version()
+    key = (tenant_db(), version, user.pk)
+
+    permissions = _local_cache.get(key)
+    if permissions is None:
+        cache = get_cache()
+        cache_key = permissions_cache_key(version, user.pk)
+
+        permissions = cache.get(cache_key)
+        if permissions is None:
+            with replica_reads():
+                permissions = load_user_permissions(user)
+                if replica_may_be_stale("rbac"):
+                    user._rbac_permissions = permissions
+                    return permissions
+            cache.set(cache_key, permissions, getattr(settings, "RBAC_CACHE_TIMEOUT", 300))
+
+        _local_cache.set(key, permissions)
+
+    user._rbac_permissions = permissions
+    return permissions
+
+
+async def aget_user_permissions(user):
+
+    #async twin of get_user_permissions for the ASGI views, cache calls go
+    #through aget/aadd so none of them block the event loop
+    cached = getattr(user, "_rbac_permissions", None)
+    if cached is not None:
+        return cached
+
+    version = await aget_permission_version()
+    key = (tenant_db(), version, user.pk)
+
+    permissions = _local_cache.get(key)
+    if permissions is None:
+        cache = get_cache()
+        cache_key = permissions_cache_key(version, user.pk)
+
+        permissions = await cache.aget(cache_key)
+        if permissions is None:
+            permissions = frozenset([code async for code in user_permissions_query(user)])
+            await cache.aset(cache_key, permissions, getattr(settings, "RBAC_CACHE_TIMEOUT", 300))
+
+        _local_cache.set(key, permissions)
+
+    user._rbac_permissions = permissions
+    return permissions
 
 
 def user_has_permission(user, permission_code):
@@ -6,10 +179,14 @@ def user_has_permission(user, permission_code):
     if user.is_superuser:
         return True
 
-    roles = UserRole.objects.filter(user=user).values_list("role_id", flat=True)
+    with timed("permission"):
+        return permission_code in get_user_permissions(user)
 
-    permissions = RolePermission.objects.filter(
-        role_id__in=roles
-    ).values_list("permission__code", flat=True)
 
-    return permission_code in permissions
+async def auser_has_permission(user, permission_code):
+
+    if user.is_superuser:
+        return True
+
+    with timed("permission"):
+        return permission_code in await aget_user_permissions(user)
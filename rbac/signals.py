@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rbac.models import Permission, Role, RolePermission, UserRole
+from rbac.services import bump_permission_version, get_cache, role_id_key
+
+
+#soft deletes go through save(update_fields=...), so post_save covers them too
+@receiver(post_save, sender=UserRole)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_save, sender=Role)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_delete, sender=RolePermission)
+@receiver(post_delete, sender=Role)
+@receiver(post_delete, sender=Permission)
+def invalidate_permissions(sender, **kwargs):
+    bump_permission_version()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_role_id(sender, instance, **kwargs):
+    get_cache().delete(role_id_key(instance.name))
@@ -1,3 +1,65 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from rbac.models import Role, Permission, RolePermission, UserRole
+from rbac.services import PermissionLRU, auser_has_permission, user_has_permission
+
+
+class PermissionResolverTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@test.com",
+            username="user",
+            password="user123"
+        )
+        self.role = Role.objects.create(name="User")
+        self.view_perm = Permission.objects.create(code="task.view")
+        self.admin_perm = Permission.objects.create(code="task.admin")
+        RolePermission.objects.create(role=self.role, permission=self.view_perm)
+        self.user_role = UserRole.objects.create(user=self.user, role=self.role)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_permissions_loaded_once_per_request_user(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(user_has_permission(user, "task.view"))
+            self.assertFalse(user_has_permission(user, "task.admin"))
+
+    def test_shared_cache_serves_later_requests(self):
+        user_has_permission(self.fresh_user(), "task.view")
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user_has_permission(user, "task.view"))
+
+    def test_grant_invalidates_cache(self):
+        self.assertFalse(user_has_permission(self.fresh_user(), "task.admin"))
+        RolePermission.objects.create(role=self.role, permission=self.admin_perm)
+        self.assertTrue(user_has_permission(self.fresh_user(), "task.admin"))
+
+    def test_soft_delete_revokes(self):
+        self.assertTrue(user_has_permission(self.fresh_user(), "task.view"))
+        self.user_role.delete()
+        self.assertFalse(user_has_permission(self.fresh_user(), "task.view"))
+
+        self.user_role.restore()
+        self.assertTrue(user_has_permission(self.fresh_user(), "task.view"))
+
+    async def test_async_lookup_uses_async_cache_calls(self):
+        user = await User.objects.aget(pk=self.user.pk)
+        with mock.patch("rbac.services.get_permission_version", side_effect=AssertionError("sync cache call")):
+            self.assertTrue(await auser_has_permission(user, "task.view"))
+            self.assertFalse(await auser_has_permission(user, "task.admin"))
+
+    def test_local_entries_expire(self):
+        lru = PermissionLRU(10, 5)
+        with mock.patch("rbac.services.time.monotonic", return_value=100):
+            lru.set("key", frozenset({"task.view"}))
+        with mock.patch("rbac.services.time.monotonic", return_value=104):
+            self.assertEqual(lru.get("key"), frozenset({"task.view"}))
+        with mock.patch("rbac.services.time.monotonic", return_value=105):
+            self.assertIsNone(lru.get("key"))
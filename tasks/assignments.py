@@ -0,0 +1,86 @@
+from tasks.models import Task, TaskAssignment
+
+
+Through = Task.assigned_users.through
+BATCH_SIZE = 500
+
+
+def expected_rows(task_ids):
+
+    #(task_id, user_id) -> (is_deleted, created_at), straight from the m2m table
+    rows = Through.objects.filter(task_id__in=task_ids).values_list(
+        "task_id", "user_id", "task__is_deleted", "task__created_at"
+    )
+    return {(task_id, user_id): (is_deleted, created_at) for task_id, user_id, is_deleted, created_at in rows}
+
+
+def stored_rows(task_ids):
+    rows = TaskAssignment.objects.filter(task_id__in=task_ids).values_list(
+        "task_id", "user_id", "is_deleted", "created_at"
+    )
+    return {(task_id, user_id): (is_deleted, created_at) for task_id, user_id, is_deleted, created_at in rows}
+
+
+def create_rows(rows):
+    TaskAssignment.objects.bulk_create(
+        [
+            TaskAssignment(task_id=task_id, user_id=user_id, is_deleted=is_deleted, created_at=created_at)
+            for (task_id, user_id), (is_deleted, created_at) in rows.items()
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def sync_tasks(task_ids, created=False):
+
+    #rebuild the rows of these tasks, for bulk writes that skip m2m_changed.
+    #new tasks have no rows to clear
+    task_ids = list(task_ids)
+    for start in range(0, len(task_ids), BATCH_SIZE):
+        batch = task_ids[start:start + BATCH_SIZE]
+        if not created:
+            TaskAssignment.objects.filter(task_id__in=batch).delete()
+        create_rows(expected_rows(batch))
+
+
+def tasks_deleted(task_ids):
+
+    #a bulk soft delete leaves the assignees alone, only the flag moves
+    task_ids = list(task_ids)
+    for start in range(0, len(task_ids), BATCH_SIZE):
+        TaskAssignment.objects.filter(task_id__in=task_ids[start:start + BATCH_SIZE]).update(is_deleted=True)
+
+
+def assigned(instance, reverse, pk_set):
+    if not reverse:
+        rows = {(instance.pk, user_id): (instance.is_deleted, instance.created_at) for user_id in pk_set}
+    else:
+        #user.tasks.add(...): pk_set holds task ids
+        tasks = Task.all_objects.filter(pk__in=pk_set).values_list("pk", "is_deleted", "created_at")
+        rows = {(pk, instance.pk): (is_deleted, created_at) for pk, is_deleted, created_at in tasks}
+    create_rows(rows)
+
+
+def unassigned(instance, reverse, pk_set=None):
+
+    #pk_set None for clear(), every row of the task or user goes
+    if reverse:
+        rows = TaskAssignment.objects.filter(user_id=instance.pk)
+        if pk_set is not None:
+            rows = rows.filter(task_id__in=pk_set)
+    else:
+        rows = TaskAssignment.objects.filter(task_id=instance.pk)
+        if pk_set is not None:
+            rows = rows.filter(user_id__in=pk_set)
+    rows.delete()
+
+
+def task_saved(task, created, update_fields=None):
+
+    #a new task has no assignees yet, created_at never changes after insert
+    if created or (update_fields is not None and "is_deleted" not in update_fields):
+        return
+    TaskAssignment.objects.filter(task_id=task.pk).exclude(is_deleted=task.is_deleted).update(
+        is_deleted=task.is_deleted
+    )
@@ -0,0 +1,7 @@
+from django.urls import path
+from .async_views import AsyncTaskDetailView, AsyncTaskListView
+
+urlpatterns = [
+    path("task/", AsyncTaskListView.as_view(), name="async_task_list"),
+    path("<str:task_id>/", AsyncTaskDetailView.as_view(), name="async_task_detail"),
+]
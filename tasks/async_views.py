@@ -0,0 +1,159 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from backend.metrics import timed
+from backend.tenancy import tenant_db
+from login.authentication import SessionJWTAuthentication
+from rbac.services import auser_has_permission
+from tasks.filters import filter_tasks, list_keys
+from tasks.models import Task
+from tasks.pagination import InvalidCursor, aestimate_count, akeyset_page, ordering
+from tasks.search import ensure_fallback_index, fallback_indexes, uses_fallback
+from tasks.serializers import TaskReadSerializer, TaskSerializer
+
+
+#ASGI-native twins of tasks.views, mounted under /api/async/tasks/
+
+
+def error(message, code):
+    return JsonResponse({"error": message}, status=code)
+
+
+def unauthorized(request, detail):
+
+    #same body and header as DRF's handler gives the sync views
+    response = JsonResponse(
+        detail if isinstance(detail, dict) else {"detail": detail}, status=status.HTTP_401_UNAUTHORIZED
+    )
+    response.headers["WWW-Authenticate"] = SessionJWTAuthentication().authenticate_header(request)
+    return response
+
+
+class AsyncTaskView(View):
+
+    #bearer tokens, not cookies, so no CSRF check, like APIView.as_view
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        user_auth = getattr(request, "_jwt_auth", None)
+        if isinstance(user_auth, Exception):
+            return unauthorized(request, user_auth.detail)
+        if user_auth is None:
+            return unauthorized(request, "Authentication credentials were not provided.")
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get_queryset(self, request):
+        queryset = Task.objects.for_read()
+        if await auser_has_permission(request.user, "task.admin"):
+            return queryset.filter(is_deleted=False)
+        return queryset.filter(owner=request.user, is_deleted=False)
+
+
+class AsyncTaskListView(AsyncTaskView):
+
+    async def get(self, request):
+        if not await auser_has_permission(request.user, "task.view"):
+            return error("Forbidden", status.HTTP_403_FORBIDDEN)
+
+        params = request.GET
+        using = tenant_db()
+        if params.get("search") and uses_fallback(using) and not fallback_indexes[using].built:
+            await sync_to_async(ensure_fallback_index)(using)
+
+        queryset = filter_tasks(await self.get_queryset(request), params)
+
+        limit = int(params.get("limit", 10))
+        count = params.get("count")
+
+        #cursor pagination
+        cursor = params.get("cursor")
+        if cursor or params.get("pagination") == "cursor":
+            try:
+                results, next_cursor, prev_cursor = await akeyset_page(queryset, cursor, limit, list_keys(params))
+            except InvalidCursor:
+                return error("Invalid cursor", status.HTTP_400_BAD_REQUEST)
+
+            with timed("serializer"):
+                serialized = TaskReadSerializer(results, many=True).data
+
+            data = {
+                "limit": limit,
+                "next": next_cursor,
+                "previous": prev_cursor,
+                "results": serialized
+            }
+            if count == "exact":
+                data["total"] = await queryset.acount()
+            elif count == "approx":
+                data["total"] = await aestimate_count(queryset)
+            return JsonResponse(data)
+
+        #pagination
+        page = int(params.get("page", 1))
+
+        start = (page - 1) * limit
+        end = start + limit
+
+        total = await aestimate_count(queryset) if count == "approx" else await queryset.acount()
+        order = ordering(list_keys(params))
+        if params.get("search"):
+            order = ("-search_rank",) + order
+        results = [task async for task in queryset.order_by(*order)[start:end]]
+
+        with timed("serializer"):
+            serialized = TaskReadSerializer(results, many=True).data
+
+        return JsonResponse({
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "results": serialized
+        })
+
+    async def post(self, request):
+        if not await auser_has_permission(request.user, "task.create"):
+            return error("Forbidden", status.HTTP_403_FORBIDDEN)
+
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return error("Invalid JSON body", status.HTTP_400_BAD_REQUEST)
+
+        #validation resolves assignee emails, one hop for validate + save
+        serializer = TaskSerializer(data=payload)
+        if not await sync_to_async(self.create)(serializer, request.user):
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        task = await Task.objects.for_read().aget(pk=serializer.instance.pk)
+        return JsonResponse(TaskReadSerializer(task).data, status=status.HTTP_201_CREATED)
+
+    def create(self, serializer, owner):
+        with timed("serializer"):
+            if not serializer.is_valid():
+                return False
+        serializer.save(owner=owner)
+        return True
+
+
+class AsyncTaskDetailView(AsyncTaskView):
+
+    async def get(self, request, task_id):
+        if not await auser_has_permission(request.user, "task.view"):
+            return error("Forbidden", status.HTTP_403_FORBIDDEN)
+
+        queryset = await self.get_queryset(request)
+        try:
+            task = await queryset.aget(task_id=task_id)
+        except Task.DoesNotExist:
+            return error("Task not found", status.HTTP_404_NOT_FOUND)
+
+        with timed("serializer"):
+            data = TaskReadSerializer(task).data
+        return JsonResponse(data)
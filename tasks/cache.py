@@ -0,0 +1,140 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.renderers import dumps
+from backend.routers import mark_recent_write, replica_may_be_stale
+from backend.tenancy import tenant_db
+from rbac.services import get_permission_version, user_has_permission
+
+
+#versions in every cached response key: the epoch retires all of them (user email
+#changes), an owner's version their own lists and details, "all" what admins see
+VERSION_KEY = "tasks:version"
+ADMIN_SCOPE = "all"
+
+LIST_PARAMS = (
+    "search", "is_completed", "assigned_user", "created_after", "created_before",
+    "page", "limit", "pagination", "cursor", "count",
+)
+
+
+def get_cache():
+    return caches[getattr(settings, "TASKS_CACHE_ALIAS", "default")]
+
+
+def version_key(scope):
+    return f"{VERSION_KEY}:{scope}"
+
+
+def get_tasks_versions(*keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            #seeded from the clock so an evicted counter never reuses an old version
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def incr_versions(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def bump_tasks_version(owner_ids=None):
+
+    #owner_ids None retires every cached response. bumped again once the write
+    #commits, a reader in between may have cached the old rows under the first bump
+    if owner_ids is None:
+        keys = [VERSION_KEY]
+    else:
+        keys = [version_key(ADMIN_SCOPE)] + [version_key(owner_id) for owner_id in set(owner_ids)]
+    incr_versions(keys)
+    using = tenant_db()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: incr_versions(keys), using=using)
+    mark_recent_write("tasks")
+
+
+def response_key(request, scope, params):
+    normalized = sorted(
+        (name, request.query_params.get(name))
+        for name in params
+        if request.query_params.get(name)
+    )
+    digest = hashlib.sha1(json.dumps(normalized).encode()).hexdigest()
+    owner = ADMIN_SCOPE if user_has_permission(request.user, "task.admin") else request.user.pk
+    epoch, version = get_tasks_versions(VERSION_KEY, version_key(owner))
+    return f"tasks:resp:{epoch}:{version}:{get_permission_version()}:{request.user.pk}:{scope}:{digest}"
+
+
+def make_etag(data):
+    return '"%s"' % hashlib.sha1(dumps(data, sort_keys=True)).hexdigest()
+
+
+def task_etag(version, data):
+    #version first so If-Match can be checked without rebuilding the body, the
+    #digest covers what the version doesn't track (owner and assignee emails)
+    return '"v%s-%s"' % (version, hashlib.sha1(dumps(data, sort_keys=True)).hexdigest()[:16])
+
+
+def if_match_versions(request):
+
+    #None without If-Match, "*" for any version, else the task versions named by it
+    header = request.headers.get("If-Match")
+    if header is None:
+        return None
+    versions = set()
+    for tag in parse_etags(header):
+        if tag == "*":
+            return "*"
+        version = tag.removeprefix("W/").strip('"').partition("-")[0].removeprefix("v")
+        if version.isdigit():
+            versions.add(int(version))
+    return versions
+
+
+def etag_matches(request, etag):
+    #weak comparison, compression turns the ETag sent to the client into W/"..."
+    return etag in [tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))]
+
+
+def cached_response(request, scope, build, params=()):
+
+    #per-user cache of successful GET responses, retired by version bumps
+    if not getattr(settings, "TASKS_RESPONSE_CACHE", True):
+        return build()
+
+    cache = get_cache()
+    key = response_key(request, scope, params)
+    entry = cache.get(key)
+
+    if entry is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        etag = response["ETag"] if response.has_header("ETag") else make_etag(response.data)
+        if not replica_may_be_stale("tasks"):
+            cache.set(key, (response.data, etag), getattr(settings, "TASKS_RESPONSE_CACHE_TIMEOUT", 60))
+    else:
+        data, etag = entry
+        response = Response(data)
+
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    response["ETag"] = etag
+    return response
@@ -0,0 +1,81 @@
+import csv
+import io
+from itertools import islice
+
+from django.conf import settings
+
+from backend.renderers import dumps
+from tasks.pagination import KEYS, ordering
+from tasks.rendering import assignee_emails, row_encoder, row_values
+
+
+FIELDS = [
+    "task_id", "title", "description",
+    "is_completed", "assigned_users",
+    "owner",
+    "created_at", "updated_at"
+]
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def chunk_size():
+    return getattr(settings, "TASKS_EXPORT_CHUNK_SIZE", 2000)
+
+
+def export_rows(queryset, size=None, keys=KEYS):
+
+    size = size or chunk_size()
+    encode = row_encoder()
+
+    #tuples over a server-side cursor, no model instances or prefetch caches kept around
+    rows = row_values(queryset).order_by(*ordering(keys)).iterator(chunk_size=size)
+
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+
+        emails = assignee_emails([row[0] for row in chunk])
+        for row in chunk:
+            yield encode(row, emails)
+
+
+def ndjson_stream(rows, size=None):
+    size = size or chunk_size()
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield b"".join(dumps(row) + b"\n" for row in chunk)
+
+
+def csv_stream(rows, size=None):
+    size = size or chunk_size()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(FIELDS)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            break
+        for row in chunk:
+            row["assigned_users"] = ";".join(row["assigned_users"])
+            writer.writerow([row[field] for field in FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    #header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+STREAMS = {
+    "ndjson": ndjson_stream,
+    "csv": csv_stream,
+}
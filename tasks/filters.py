@@ -0,0 +1,51 @@
+from django.db.models import F, Subquery
+
+from accounts.models import User
+from tasks.pagination import ASSIGNED_KEYS, KEYS
+from tasks.search import search_tasks
+
+
+def list_keys(params):
+
+    #the keyset/ordering columns of a list filtered with these params
+    return ASSIGNED_KEYS if params.get("assigned_user") else KEYS
+
+
+def filter_tasks(queryset, params):
+
+    #search, annotates search_rank
+    search = params.get("search")
+    if search:
+        queryset = search_tasks(queryset, search)
+
+    #filters
+    is_completed = params.get("is_completed")
+    if is_completed in ["true", "false"]:
+        queryset = queryset.filter(is_completed=(is_completed == "true"))
+
+    assigned_user = params.get("assigned_user")
+    if assigned_user:
+        #through the TaskAssignment projection, one row per task and user so no DISTINCT.
+        #aliases on the same join, ordering by them reads (user, is_deleted, -created_at,
+        #-task) in index order instead of sorting every match
+        #the user is looked up in the current tenant, emails repeat across tenants.
+        #is_deleted IN (false) rather than NOT is_deleted: only an equality lets the
+        #planner walk the index past that column
+        user = User.objects.filter(email=assigned_user).values("pk")[:1]
+        queryset = queryset.filter(
+            assignments__user=Subquery(user), assignments__is_deleted__in=[False]
+        ).alias(
+            assigned_created_at=F("assignments__created_at"), assigned_task_id=F("assignments__task_id")
+        )
+
+    #on the keyset column, so an assigned_user range stays inside the projection's index
+    created = list_keys(params)[0]
+    created_after = params.get("created_after")
+    if created_after:
+        queryset = queryset.filter(**{f"{created}__gte": created_after})
+
+    created_before = params.get("created_before")
+    if created_before:
+        queryset = queryset.filter(**{f"{created}__lte": created_before})
+
+    return queryset
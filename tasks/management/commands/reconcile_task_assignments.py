@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from backend.tenancy import add_tenant_argument, command_tenant
+from tasks.assignments import BATCH_SIZE, expected_rows, stored_rows, sync_tasks
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = "Check the TaskAssignment projection against the assignee table and rebuild drifted tasks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report tasks whose rows drifted")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        add_tenant_argument(parser)
+
+    def handle(self, *args, **options):
+        with command_tenant(options["tenant"]):
+            self.reconcile(options)
+
+    def reconcile(self, options):
+        batch_size = options["batch_size"]
+        task_ids = list(Task.all_objects.order_by("pk").values_list("pk", flat=True))
+
+        drifted = 0
+        for start in range(0, len(task_ids), batch_size):
+            batch = task_ids[start:start + batch_size]
+            expected = expected_rows(batch)
+            stored = stored_rows(batch)
+            if expected == stored:
+                continue
+
+            stale = sorted({key[0] for key in expected.keys() ^ stored.keys()} | {
+                key[0] for key in expected.keys() & stored.keys() if expected[key] != stored[key]
+            })
+            for task_id in stale:
+                missing = sorted(user for task, user in expected.keys() - stored.keys() if task == task_id)
+                extra = sorted(user for task, user in stored.keys() - expected.keys() if task == task_id)
+                outdated = sorted(
+                    user for task, user in expected.keys() & stored.keys()
+                    if task == task_id and expected[task, user] != stored[task, user]
+                )
+                self.stdout.write(f"task {task_id}: missing users {missing}, extra users {extra}, outdated users {outdated}")
+            drifted += len(stale)
+
+            if not options["check"]:
+                sync_tasks(stale)
+
+        if options["check"]:
+            self.stdout.write(f"{drifted} tasks drifted")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Checked {len(task_ids)} tasks, rebuilt {drifted}"))
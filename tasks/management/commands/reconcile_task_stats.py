@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from backend.tenancy import add_tenant_argument, command_tenant
+from tasks.models import TaskStats
+from tasks.stats import BATCH_SIZE, compute_stats, reconcile_users
+
+
+class Command(BaseCommand):
+    help = "Recount the per-user TaskStats counters from the task tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report users whose counters drifted")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        add_tenant_argument(parser)
+
+    def handle(self, *args, **options):
+        with command_tenant(options["tenant"]):
+            self.reconcile(options)
+
+    def reconcile(self, options):
+        batch_size = options["batch_size"]
+        user_ids = list(User.all_objects.order_by("pk").values_list("pk", flat=True))
+
+        drifted = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            expected = compute_stats(batch)
+            stored = {
+                row["user_id"]: row
+                for row in TaskStats.objects.filter(user_id__in=batch).values("user_id", *TaskStats.COUNTERS)
+            }
+
+            stale = []
+            for user_id, counters in expected.items():
+                current = stored.get(user_id)
+                if current is None:
+                    #no row yet, built on first use
+                    continue
+                if any(current[name] != value for name, value in counters.items()):
+                    stale.append(user_id)
+                    self.stdout.write(f"user {user_id}: stored {current}, expected {counters}")
+            drifted += len(stale)
+
+            if not options["check"]:
+                reconcile_users(batch)
+
+        if options["check"]:
+            self.stdout.write(f"{drifted} users drifted")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {len(user_ids)} users, {drifted} had drifted"))
@@ -0,0 +1,61 @@
+# Generated by Django 6.0 on 2026-10-18 21:04
+
+import backend.tenancy
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_changes_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_live_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_live_owner_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_live_completed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_owner_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='tenant',
+            field=models.CharField(default=backend.tenancy.get_current_tenant, editable=False, max_length=63),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['tenant', '-created_at', '-id'], name='task_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['tenant', 'owner', '-created_at', '-id'], name='task_live_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['tenant', 'is_completed', '-created_at', '-id'], name='task_live_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['tenant', 'updated_at', 'id'], name='task_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['tenant', 'owner', 'updated_at', 'id'], name='task_owner_updated_idx'),
+        ),
+    ]
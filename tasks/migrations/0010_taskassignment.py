@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 21:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+#existing assignments, later ones are written by tasks.assignments
+BACKFILL = """
+INSERT INTO tasks_taskassignment (task_id, user_id, is_deleted, created_at)
+SELECT assigned.task_id, assigned.user_id, task.is_deleted, task.created_at
+FROM tasks_task_assigned_users assigned
+JOIN tasks_task task ON task.id = assigned.task_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='tasks.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'is_deleted', '-created_at', '-task'], name='task_assignment_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task', 'user'), name='task_assignment_unique')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
@@ -1,8 +1,27 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import DatabaseError, models
+from django.db.models import F
 from accounts.models import User
-from backend.models import SoftDeleteManager, SoftDeleteModel
+from backend.ids import next_codes
+from backend.models import SoftDeleteModel, TenantManager, TenantModel
 
-class Task(SoftDeleteModel):
+
+class StaleVersion(DatabaseError):
+
+    #a conditional save found the row at another version, someone wrote it first.
+    #catch it outside an atomic block around the save, the failed save spoils the transaction
+    pass
+
+
+class TaskQuerySet(models.QuerySet):
+
+    def for_read(self):
+        return self.defer("search_vector").select_related("owner").prefetch_related(
+            models.Prefetch("assigned_users", queryset=User.objects.only("id", "email"))
+        )
+
+
+class Task(TenantModel, SoftDeleteModel):
     task_id = models.CharField(max_length=30, unique=True, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -16,16 +35,146 @@ class Task(SoftDeleteModel):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    #bumped by every write, the api's ETag/If-Match token
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    #maintained by a database trigger on postgres, see migration 0004
+    search_vector = SearchVectorField(null=True, editable=False)
     
-    objects = SoftDeleteManager()
-    all_objects = models.Manager()
+    objects = TenantManager.from_queryset(TaskQuerySet)()
+    all_objects = models.Manager.from_queryset(TaskQuerySet)()
+
+    class Meta:
+        #partial indexes, every api query filters is_deleted=False. all led by
+        #tenant, so tenants sharing a database only scan their own rows
+        indexes = [
+            #keyset pagination order
+            models.Index(
+                fields=["tenant", "-created_at", "-id"],
+                condition=models.Q(is_deleted=False),
+                name="task_live_created_idx"
+            ),
+            models.Index(
+                fields=["tenant", "owner", "-created_at", "-id"],
+                condition=models.Q(is_deleted=False),
+                name="task_live_owner_idx"
+            ),
+            models.Index(
+                fields=["tenant", "is_completed", "-created_at", "-id"],
+                condition=models.Q(is_deleted=False),
+                name="task_live_completed_idx"
+            ),
+            #change feed watermark, deleted rows included for tombstones
+            models.Index(fields=["tenant", "updated_at", "id"], name="task_updated_idx"),
+            models.Index(fields=["tenant", "owner", "updated_at", "id"], name="task_owner_updated_idx"),
+        ]
     
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        #last saved state, tasks.stats applies counter deltas against it
+        loaded = instance.__dict__
+        if all(field in loaded for field in STATS_FIELDS):
+            instance._stats_state = tuple(loaded[field] for field in STATS_FIELDS)
+        return instance
+
+    def save(self, *args, expected_version=None, **kwargs):
+
+        #expected_version makes the update conditional, UPDATE ... WHERE version = expected,
+        #and raises StaleVersion when no row matches. otherwise the row's own version is
+        #bumped, so versions only go up even when this instance is stale
         if not self.task_id:
-            last_task = Task.all_objects.all().order_by('id').last()
-            next_id = 1 if not last_task else last_task.id + 1
-            self.task_id = f"TK{next_id}"
-        super().save(*args, **kwargs)
+            self.task_id = next_codes(Task.all_objects, "task_id", "TK")[0]
+        update_fields = kwargs.get("update_fields")
+        if self._state.adding or (update_fields is not None and not update_fields):
+            return super().save(*args, **kwargs)
+
+        loaded = self.version
+        self.version = F("version") + 1 if expected_version is None else expected_version + 1
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+        self._expected_version = expected_version
+        try:
+            super().save(*args, **kwargs)
+        except StaleVersion:
+            self.version = loaded
+            raise
+        finally:
+            self._expected_version = None
+
+        if hasattr(self.version, "resolve_expression"):
+            self.refresh_from_db(fields=["version"])
+
+    def _do_update(self, base_qs, *args, **kwargs):
+        expected = getattr(self, "_expected_version", None)
+        if expected is None:
+            return super()._do_update(base_qs, *args, **kwargs)
+        if super()._do_update(base_qs.filter(version=expected), *args, **kwargs):
+            return True
+        raise StaleVersion(f"Task {self.pk} is no longer at version {expected}")
+
+    def set_assignees(self, user_ids):
+
+        #writes only the difference, m2m_changed still fires for the rows that change
+        if "assigned_users" in getattr(self, "_prefetched_objects_cache", {}):
+            current = {user.pk for user in self.assigned_users.all()}
+        else:
+            current = set(self.assigned_users.values_list("pk", flat=True))
+
+        removed = current - set(user_ids)
+        added = set(user_ids) - current
+        if removed:
+            self.assigned_users.remove(*removed)
+        if added:
+            self.assigned_users.add(*added)
 
     def __str__(self):
         return self.title
+
+
+#the Task fields TaskStats counts depend on
+STATS_FIELDS = ("owner_id", "is_completed", "is_deleted")
+
+
+class TaskStats(models.Model):
+
+    #per-user counters over live tasks, kept by tasks.stats, rebuilt by reconcile_task_stats
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="task_stats")
+    owned = models.IntegerField(default=0)
+    owned_completed = models.IntegerField(default=0)
+    assigned = models.IntegerField(default=0)
+    assigned_completed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    #derived data, archive_deleted may drop it with the user
+    archive_cascade = True
+
+    COUNTERS = ("owned", "owned_completed", "assigned", "assigned_completed")
+
+    def __str__(self):
+        return f"stats for {self.user_id}"
+
+
+class TaskAssignment(models.Model):
+
+    #one row per assignment with the task columns the assigned_user filter reads, so
+    #"assigned to X" is an index range scan instead of a join needing DISTINCT.
+    #kept by tasks.assignments, checked and repaired by reconcile_task_assignments
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="assignments")
+    is_deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+    #derived data, archive_deleted may drop it with the user or task
+    archive_cascade = True
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["task", "user"], name="task_assignment_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "is_deleted", "-created_at", "-task"], name="task_assignment_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} assigned to {self.user_id}"
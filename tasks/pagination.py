@@ -0,0 +1,109 @@
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+ORDERING = ("-created_at", "-id")
+
+#keyset columns: the task's (created_at, id), or the same values copied onto
+#TaskAssignment when the assigned_user filter walks that table's index
+KEYS = ("created_at", "id")
+ASSIGNED_KEYS = ("assigned_created_at", "assigned_task_id")
+
+
+def ordering(keys=KEYS):
+    return tuple(f"-{key}" for key in keys)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(task, direction):
+    payload = {"c": task.created_at.isoformat(), "i": task.id, "d": direction}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        created_at = parse_datetime(payload["c"])
+        pk = int(payload["i"])
+        direction = payload["d"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor")
+
+    if created_at is None or direction not in ("next", "prev"):
+        raise InvalidCursor("Invalid cursor")
+    return created_at, pk, direction
+
+
+def keyset_query(queryset, cursor, limit, keys=KEYS):
+
+    #returns the sliced queryset (one extra row to detect more) and its direction
+    created, pk_key = keys
+    direction = "next"
+    if cursor:
+        created_at, pk, direction = decode_cursor(cursor)
+        lookup = "lt" if direction == "next" else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{created}__{lookup}": created_at}) | Q(**{created: created_at, f"{pk_key}__{lookup}": pk})
+        )
+
+    if direction == "next":
+        return queryset.order_by(*ordering(keys))[:limit + 1], direction
+    return queryset.order_by(*keys)[:limit + 1], direction
+
+
+def keyset_result(rows, cursor, direction, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if direction == "prev":
+        rows.reverse()
+        has_next = bool(cursor)
+        has_prev = has_more
+    else:
+        has_next = has_more
+        has_prev = bool(cursor)
+
+    next_cursor = encode_cursor(rows[-1], "next") if rows and has_next else None
+    prev_cursor = encode_cursor(rows[0], "prev") if rows and has_prev else None
+
+    return rows, next_cursor, prev_cursor
+
+
+def keyset_page(queryset, cursor, limit, keys=KEYS):
+    page, direction = keyset_query(queryset, cursor, limit, keys)
+    return keyset_result(list(page), cursor, direction, limit)
+
+
+async def akeyset_page(queryset, cursor, limit, keys=KEYS):
+    page, direction = keyset_query(queryset, cursor, limit, keys)
+    return keyset_result([row async for row in page], cursor, direction, limit)
+
+
+def plan_rows(explain_output):
+    plan = json.loads(explain_output)
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan["Plan"]["Plan Rows"])
+
+
+def estimate_count(queryset):
+
+    #planner estimate on postgres, exact count everywhere else
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+    return plan_rows(queryset.order_by().explain(format="json"))
+
+
+async def aestimate_count(queryset):
+    if connections[queryset.db].vendor != "postgresql":
+        return await queryset.acount()
+    return plan_rows(await queryset.order_by().aexplain(format="json"))
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.models import Task
+
+
+#columns of a task row, list/detail/export read these instead of model instances
+COLUMNS = (
+    "id", "task_id", "title", "description", "is_completed",
+    "owner__email", "created_at", "updated_at", "version"
+)
+
+
+def row_values(queryset):
+
+    #named tuples, so keyset cursors can still read .id and .created_at
+    return queryset.prefetch_related(None).values_list(*COLUMNS, named=True)
+
+
+def assignee_emails(task_ids):
+
+    #one query per page or export chunk instead of one per task
+    emails = {}
+    rows = Task.assigned_users.through.objects.filter(task_id__in=task_ids).values_list(
+        "task_id", "user__email"
+    )
+    for task_id, email in rows:
+        emails.setdefault(task_id, []).append(email)
+    return emails
+
+
+def datetime_encoder():
+
+    #same output as drf's DateTimeField, without its per-call settings lookups
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def encode(value):
+        if value is None:
+            return None
+        if tz is not None:
+            value = value.astimezone(tz)
+        text = value.isoformat()
+        if text.endswith("+00:00"):
+            text = text[:-6] + "Z"
+        return text
+
+    return encode
+
+
+def row_encoder():
+
+    #built once per response, then a plain function call per row
+    to_datetime = datetime_encoder()
+
+    def encode(row, emails):
+        pk, task_id, title, description, is_completed, owner, created_at, updated_at, _version = row
+        return {
+            "task_id": task_id,
+            "title": title,
+            "description": description,
+            "is_completed": is_completed,
+            "assigned_users": emails.get(pk, []),
+            "owner": owner,
+            "created_at": to_datetime(created_at),
+            "updated_at": to_datetime(updated_at),
+        }
+
+    return encode
+
+
+def encode_rows(rows):
+
+    #rows from row_values(), same shape as TaskReadSerializer
+    emails = assignee_emails([row[0] for row in rows])
+    encode = row_encoder()
+    return [encode(row, emails) for row in rows]
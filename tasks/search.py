@@ -0,0 +1,139 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+
+
+TOKEN_RE = re.compile(r"\w+")
+
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class InvertedIndex:
+
+    #pure python fallback used when the database has no full text search.
+    #it lives in process memory and only hears about this process's commits,
+    #so it is for single-process setups (tests, local SQLite)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = defaultdict(dict)
+        self.doc_tokens = {}
+        self.tokens = []
+        self.built = False
+
+    def _add(self, pk, title, description):
+        weights = defaultdict(float)
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            if token not in self.postings:
+                bisect.insort(self.tokens, token)
+            self.postings[token][pk] = weight
+        self.doc_tokens[pk] = set(weights)
+
+    def _remove(self, pk):
+        for token in self.doc_tokens.pop(pk, ()):
+            docs = self.postings[token]
+            docs.pop(pk, None)
+            if not docs:
+                del self.postings[token]
+                self.tokens.pop(bisect.bisect_left(self.tokens, token))
+
+    def build(self, rows):
+        with self._lock:
+            self.postings.clear()
+            self.doc_tokens.clear()
+            self.tokens = []
+            for pk, title, description in rows:
+                self._add(pk, title, description)
+            self.built = True
+
+    def update(self, pk, title, description):
+        with self._lock:
+            self._remove(pk)
+            self._add(pk, title, description)
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(pk)
+
+    def _prefix_matches(self, term):
+        scores = defaultdict(float)
+        start = bisect.bisect_left(self.tokens, term)
+        for token in self.tokens[start:]:
+            if not token.startswith(term):
+                break
+            for pk, weight in self.postings[token].items():
+                scores[pk] += weight
+        return scores
+
+    def search(self, terms):
+        with self._lock:
+            result = None
+            for term in terms:
+                matches = self._prefix_matches(term)
+                if result is None:
+                    result = matches
+                else:
+                    result = {pk: score + matches[pk] for pk, score in result.items() if pk in matches}
+                if not result:
+                    return {}
+            return result or {}
+
+
+#one per database, tenants on their own database have their own rows and pks
+fallback_indexes = defaultdict(InvertedIndex)
+
+
+def uses_fallback(using="default"):
+    return connections[using].vendor != "postgresql"
+
+
+def ensure_fallback_index(using="default"):
+    index = fallback_indexes[using]
+    if not index.built:
+        from tasks.models import Task
+        index.build(Task.all_objects.using(using).values_list("pk", "title", "description").iterator())
+    return index
+
+
+def no_matches(queryset):
+    return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def search_tasks(queryset, text):
+
+    #every term is prefix matched and all terms must match
+    terms = tokenize(text)
+    if not terms:
+        return no_matches(queryset)
+
+    if uses_fallback(queryset.db):
+        scores = ensure_fallback_index(queryset.db).search(terms)
+        if not scores:
+            return no_matches(queryset)
+        return queryset.filter(pk__in=scores).annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        )
+
+    query = SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type="raw", config="english")
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F("search_vector"), query)
+    )
@@ -3,13 +3,29 @@ from .models import Task
 from accounts.models import User
 
 
+def resolve_emails(emails):
+    return dict(User.objects.filter(email__in=set(emails)).values_list("email", "id"))
+
+
+class AssigneeEmailsField(serializers.ListField):
+
+    #emails in, set of user pks out: one query for the whole list, every unknown email reported at once
+    child = serializers.EmailField()
+
+    def to_internal_value(self, data):
+        emails = super().to_internal_value(data)
+        user_ids = resolve_emails(emails) if emails else {}
+        unknown = [email for email in dict.fromkeys(emails) if email not in user_ids]
+        if unknown:
+            raise serializers.ValidationError([f"Unknown user: {email}" for email in unknown])
+        return {user_ids[email] for email in emails}
+
+    def to_representation(self, value):
+        return [user.email for user in value.all()]
+
+
 class TaskSerializer(serializers.ModelSerializer):
-    assigned_users = serializers.SlugRelatedField(
-        slug_field="email",
-        queryset=User.objects.all(),
-        many=True,
-        required=False
-    )
+    assigned_users = AssigneeEmailsField(required=False)
 
     owner = serializers.EmailField(source="owner.email", read_only=True)
 
@@ -22,3 +38,56 @@ class TaskSerializer(serializers.ModelSerializer):
             "created_at", "updated_at"
         ]
         read_only_fields = ["task_id", "created_at", "updated_at", "owner"]
+
+    def create(self, validated_data):
+        user_ids = validated_data.pop("assigned_users", None)
+        task = super().create(validated_data)
+        if user_ids:
+            task.assigned_users.add(*user_ids)
+        return task
+
+    def update(self, instance, validated_data):
+
+        #writes only the columns whose value changed, save(expected_version=...)
+        #makes the UPDATE conditional on the version the caller read
+        expected_version = validated_data.pop("expected_version", None)
+        user_ids = validated_data.pop("assigned_users", None)
+        changed = [name for name, value in validated_data.items() if getattr(instance, name) != value]
+        assignees_changed = user_ids is not None and user_ids != {user.pk for user in instance.assigned_users.all()}
+
+        if changed or assignees_changed:
+            for name in changed:
+                setattr(instance, name, validated_data[name])
+            instance.save(update_fields=[*changed, "updated_at"], expected_version=expected_version)
+        if assignees_changed:
+            instance.set_assignees(user_ids)
+        return instance
+
+
+class TaskReadSerializer(serializers.BaseSerializer):
+
+    #read-only fast path, expects a queryset from Task.objects.for_read()
+    datetime_field = serializers.DateTimeField()
+
+    def to_representation(self, task):
+        to_datetime = self.datetime_field.to_representation
+        return {
+            "task_id": task.task_id,
+            "title": task.title,
+            "description": task.description,
+            "is_completed": task.is_completed,
+            "assigned_users": [user.email for user in task.assigned_users.all()],
+            "owner": task.owner.email if task.owner_id else None,
+            "created_at": to_datetime(task.created_at),
+            "updated_at": to_datetime(task.updated_at),
+        }
+
+
+class TaskBulkSerializer(serializers.ModelSerializer):
+
+    #validation only, assignee emails are resolved for the whole batch in tasks.services
+    assigned_users = serializers.ListField(child=serializers.EmailField(), required=False)
+
+    class Meta:
+        model = Task
+        fields = ["title", "description", "is_completed", "assigned_users"]
@@ -0,0 +1,166 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend.ids import next_codes
+from backend.tenancy import tenant_db
+from tasks.models import Task
+from tasks.serializers import TaskBulkSerializer, resolve_emails
+from tasks.signals import tasks_bulk_changed
+from tasks.stats import affected_users
+
+
+BATCH_SIZE = 500
+
+
+def validate_items(items, instances=None, partial=False):
+
+    #returns (valid, errors): valid is [(index, validated_data)], errors is {index: errors}
+    valid, errors = [], {}
+    for index, item in enumerate(items):
+        instance = instances[index] if instances else None
+        serializer = TaskBulkSerializer(instance, data=item, partial=partial)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors[index] = serializer.errors
+
+    emails = [email for _, data in valid for email in data.get("assigned_users", [])]
+    user_ids = resolve_emails(emails) if emails else {}
+
+    resolved = []
+    for index, data in valid:
+        unknown = [email for email in data.get("assigned_users", []) if email not in user_ids]
+        if unknown:
+            errors[index] = {"assigned_users": [f"Unknown user: {email}" for email in unknown]}
+            continue
+        if "assigned_users" in data:
+            data["assigned_users"] = {user_ids[email] for email in data["assigned_users"]}
+        resolved.append((index, data))
+
+    return resolved, errors
+
+
+def add_assignees(assignments):
+    Through = Task.assigned_users.through
+    Through.objects.bulk_create(
+        [Through(task_id=task_id, user_id=user_id) for task_id, user_id in assignments],
+        batch_size=BATCH_SIZE
+    )
+
+
+def bulk_create_tasks(owner, items):
+
+    valid, errors = validate_items(items)
+    created = {}
+    if not valid:
+        return created, errors
+
+    codes = next_codes(Task.all_objects, "task_id", "TK", count=len(valid))
+    tasks = []
+    for (index, data), code in zip(valid, codes):
+        fields = {key: value for key, value in data.items() if key != "assigned_users"}
+        tasks.append(Task(task_id=code, owner=owner, **fields))
+
+    with transaction.atomic(using=tenant_db()):
+        Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+        add_assignees(
+            (task.pk, user_id)
+            for task, (_, data) in zip(tasks, valid)
+            for user_id in data.get("assigned_users", ())
+        )
+
+    assignees = {user_id for _, data in valid for user_id in data.get("assigned_users", ())}
+    tasks_bulk_changed.send(
+        sender=Task, task_ids=[task.pk for task in tasks], action="created", user_ids={owner.pk} | assignees
+    )
+
+    for task, (index, _) in zip(tasks, valid):
+        created[index] = task
+    return created, errors
+
+
+def bulk_update_tasks(queryset, items):
+
+    errors = {}
+    task_ids = [item.get("task_id") if isinstance(item, dict) else None for item in items]
+    tasks = {task.task_id: task for task in queryset.filter(task_id__in=[t for t in task_ids if t])}
+
+    found = []
+    for index, task_id in enumerate(task_ids):
+        if task_id in tasks:
+            found.append(index)
+        else:
+            errors[index] = {"task_id": ["Task not found"]}
+
+    valid, item_errors = validate_items(
+        [items[index] for index in found],
+        instances=[tasks[task_ids[index]] for index in found],
+        partial=True
+    )
+    errors.update({found[index]: error for index, error in item_errors.items()})
+
+    updated = {}
+    if not valid:
+        return updated, errors
+
+    now = timezone.now()
+    fields = {"updated_at", "version"}
+    assignee_changes = {}
+    unassigned = set()
+    for position, data in valid:
+        index = found[position]
+        task = tasks[task_ids[index]]
+        for key, value in data.items():
+            if key == "assigned_users":
+                assignee_changes[task.pk] = value
+            else:
+                setattr(task, key, value)
+                fields.add(key)
+        task.updated_at = now
+        task.version = F("version") + 1
+        updated[index] = task
+
+    with transaction.atomic(using=tenant_db()):
+        Task.objects.bulk_update(updated.values(), sorted(fields), batch_size=BATCH_SIZE)
+        if assignee_changes:
+            Through = Task.assigned_users.through
+            current = {}
+            for row_id, task_pk, user_id in Through.objects.filter(
+                task_id__in=assignee_changes
+            ).values_list("id", "task_id", "user_id"):
+                current.setdefault(task_pk, {})[user_id] = row_id
+
+            removed, added = [], []
+            for task_pk, wanted in assignee_changes.items():
+                have = current.get(task_pk, {})
+                for user_id, row_id in have.items():
+                    if user_id not in wanted:
+                        removed.append(row_id)
+                        unassigned.add(user_id)
+                added.extend((task_pk, user_id) for user_id in wanted if user_id not in have)
+
+            if removed:
+                Through.objects.filter(id__in=removed).delete()
+            add_assignees(added)
+
+    task_pks = [task.pk for task in updated.values()]
+    tasks_bulk_changed.send(
+        sender=Task, task_ids=task_pks, action="updated", user_ids=affected_users(task_pks) | unassigned
+    )
+    return updated, errors
+
+
+def bulk_delete_tasks(queryset, task_ids):
+
+    found = dict(queryset.filter(task_id__in=task_ids).values_list("task_id", "pk"))
+    if found:
+        now = timezone.now()
+        Task.objects.filter(pk__in=found.values()).update(
+            is_deleted=True, deleted_at=now, updated_at=now, version=F("version") + 1
+        )
+        tasks_bulk_changed.send(sender=Task, task_ids=list(found.values()), action="deleted")
+
+    deleted = [task_id for task_id in task_ids if task_id in found]
+    missing = [task_id for task_id in task_ids if task_id not in found]
+    return deleted, missing
@@ -0,0 +1,171 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from accounts.models import User
+from tasks import assignments, stats
+from tasks.cache import bump_tasks_version
+from tasks.models import Task
+from backend.tenancy import tenant_db
+from tasks.search import fallback_indexes, uses_fallback
+
+
+#sent by tasks.services after bulk writes, which skip the model signals
+#kwargs: task_ids (primary keys), action ("created", "updated" or "deleted"),
+#optionally user_ids, every user whose counters may have changed, when the sender knows them
+tasks_bulk_changed = Signal()
+
+
+#keep the in-process search index in step on databases without full text search.
+#changes are applied on commit, so a rolled back write never shows up in search
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, created, update_fields=None, using="default", **kwargs):
+    index = fallback_indexes.get(using)
+    if index is None or not index.built or not uses_fallback(using):
+        return
+    if created or update_fields is None or {"title", "description"} & set(update_fields):
+        pk, title, description = instance.pk, instance.title, instance.description
+        transaction.on_commit(lambda: index.update(pk, title, description), using=using)
+
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, using="default", **kwargs):
+    index = fallback_indexes.get(using)
+    if index is not None and index.built:
+        pk = instance.pk
+        transaction.on_commit(lambda: index.remove(pk), using=using)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def index_bulk_tasks(sender, task_ids, **kwargs):
+    using = tenant_db()
+    index = fallback_indexes.get(using)
+    if index is None or not index.built or not uses_fallback(using):
+        return
+
+    def reindex():
+        rows = Task.all_objects.using(using).filter(pk__in=task_ids).values_list("pk", "title", "description")
+        for pk, title, description in rows:
+            index.update(pk, title, description)
+
+    transaction.on_commit(reindex, using=using)
+
+
+#cached list/detail responses, per owner, admins' through the "all" scope
+def task_owners(task_ids):
+    return set(Task.all_objects.filter(pk__in=task_ids).values_list("owner_id", flat=True))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_responses(sender, instance, **kwargs):
+    bump_tasks_version([instance.owner_id])
+
+
+@receiver(m2m_changed, sender=Task.assigned_users.through)
+def invalidate_assignee_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith("pre_"):
+        return
+    if not reverse:
+        bump_tasks_version([instance.owner_id])
+    elif action == "post_clear":
+        bump_tasks_version(task_owners(getattr(instance, "_stats_cleared", ())))
+    else:
+        bump_tasks_version(task_owners(pk_set or ()))
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def invalidate_bulk_responses(sender, task_ids, user_ids=None, **kwargs):
+    #user_ids, when sent, already covers the owners
+    bump_tasks_version(task_owners(task_ids) if user_ids is None else user_ids)
+
+
+#assignee changes count as task changes for the /changes/ feed
+@receiver(m2m_changed, sender=Task.assigned_users.through)
+def touch_assigned_tasks(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    now = timezone.now()
+    touched = {"updated_at": now, "version": F("version") + 1}
+    if not reverse:
+        Task.all_objects.filter(pk=instance.pk).update(**touched)
+        instance.updated_at = now
+        instance.version += 1
+    elif action == "post_clear":
+        Task.all_objects.filter(pk__in=getattr(instance, "_stats_cleared", ())).update(**touched)
+    elif pk_set:
+        Task.all_objects.filter(pk__in=pk_set).update(**touched)
+
+
+#per-user TaskStats counters
+@receiver(post_save, sender=Task)
+def count_task(sender, instance, created, update_fields=None, **kwargs):
+    stats.task_saved(instance, created, update_fields)
+
+
+@receiver(pre_delete, sender=Task)
+def remember_assignees(sender, instance, **kwargs):
+
+    #the through rows are gone by post_delete
+    if not instance.is_deleted:
+        instance._stats_assignees = stats.assignee_ids(instance)
+
+
+@receiver(post_delete, sender=Task)
+def uncount_task(sender, instance, **kwargs):
+    stats.task_deleted(instance, getattr(instance, "_stats_assignees", []))
+
+
+@receiver(m2m_changed, sender=Task.assigned_users.through)
+def count_assignees(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        if reverse:
+            instance._stats_cleared = set(instance.tasks.values_list("pk", flat=True))
+        else:
+            instance._stats_cleared = set(stats.assignee_ids(instance))
+    elif action == "post_clear":
+        stats.assignees_changed(instance, reverse, getattr(instance, "_stats_cleared", set()), -1)
+    elif action in ("post_add", "post_remove") and pk_set:
+        stats.assignees_changed(instance, reverse, pk_set, 1 if action == "post_add" else -1)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def count_bulk_tasks(sender, task_ids, user_ids=None, **kwargs):
+    stats.reconcile_users(stats.affected_users(task_ids) if user_ids is None else user_ids)
+
+
+#TaskAssignment rows behind the assigned_user filter
+@receiver(post_save, sender=Task)
+def project_task(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        assignments.task_saved(instance, created, update_fields)
+
+
+@receiver(m2m_changed, sender=Task.assigned_users.through)
+def project_assignees(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add" and pk_set:
+        assignments.assigned(instance, reverse, pk_set)
+    elif action == "post_remove" and pk_set:
+        assignments.unassigned(instance, reverse, pk_set)
+    elif action == "post_clear":
+        assignments.unassigned(instance, reverse)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def project_bulk_tasks(sender, task_ids, action=None, **kwargs):
+    if action == "deleted":
+        assignments.tasks_deleted(task_ids)
+    else:
+        assignments.sync_tasks(task_ids, created=action == "created")
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_emails(sender, created, update_fields=None, **kwargs):
+
+    #responses embed owner/assignee emails
+    if created or (update_fields is not None and "email" not in update_fields):
+        return
+    bump_tasks_version()
@@ -0,0 +1,136 @@
+from django.db.models import Count, F, Q
+
+from tasks.models import STATS_FIELDS, Task, TaskStats
+
+
+Through = Task.assigned_users.through
+BATCH_SIZE = 500
+
+
+def task_state(task):
+    return tuple(getattr(task, field) for field in STATS_FIELDS)
+
+
+def contribution(state):
+
+    #(count, completed) a task in this state adds to its owner's and assignees' counters
+    _, is_completed, is_deleted = state
+    if is_deleted:
+        return 0, 0
+    return 1, int(bool(is_completed))
+
+
+def compute_stats(user_ids):
+    stats = {user_id: dict.fromkeys(TaskStats.COUNTERS, 0) for user_id in user_ids}
+
+    owned = Task.all_objects.filter(owner_id__in=user_ids, is_deleted=False).order_by().values(
+        "owner_id"
+    ).annotate(total=Count("id"), completed=Count("id", filter=Q(is_completed=True)))
+    for row in owned:
+        stats[row["owner_id"]].update(owned=row["total"], owned_completed=row["completed"])
+
+    assigned = Through.objects.filter(user_id__in=user_ids, task__is_deleted=False).order_by().values(
+        "user_id"
+    ).annotate(total=Count("id"), completed=Count("id", filter=Q(task__is_completed=True)))
+    for row in assigned:
+        stats[row["user_id"]].update(assigned=row["total"], assigned_completed=row["completed"])
+
+    return stats
+
+
+def reconcile_users(user_ids):
+
+    #recount from the task tables and upsert, exact whatever the counters held before
+    user_ids = sorted(set(user_id for user_id in user_ids if user_id is not None))
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        stats = compute_stats(user_ids[start:start + BATCH_SIZE])
+        TaskStats.objects.bulk_create(
+            [TaskStats(user_id=user_id, **counters) for user_id, counters in stats.items()],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=list(TaskStats.COUNTERS)
+        )
+
+
+def apply_delta(prefix, user_ids, count, completed):
+    user_ids = set(user_id for user_id in user_ids if user_id is not None)
+    if not user_ids or (count == 0 and completed == 0):
+        return
+
+    updated = TaskStats.objects.filter(user_id__in=user_ids).update(**{
+        prefix: F(prefix) + count,
+        f"{prefix}_completed": F(f"{prefix}_completed") + completed,
+    })
+
+    #no row yet, count from scratch (this change included)
+    if updated < len(user_ids):
+        existing = set(TaskStats.objects.filter(user_id__in=user_ids).values_list("user_id", flat=True))
+        reconcile_users(user_ids - existing)
+
+
+def assignee_ids(task):
+    return list(Through.objects.filter(task_id=task.pk).values_list("user_id", flat=True))
+
+
+def task_saved(task, created, update_fields=None):
+    old = (task.owner_id, False, True) if created else getattr(task, "_stats_state", None)
+    new = task_state(task)
+    if old is not None and update_fields is not None:
+        #fields left out of update_fields were not written
+        names = {Task._meta.get_field(name).attname for name in update_fields}
+        new = tuple(value if field in names else previous for field, value, previous in zip(STATS_FIELDS, new, old))
+    task._stats_state = new
+
+    if old is None:
+        #not loaded from the database, no baseline to diff against
+        reconcile_users([task.owner_id] + assignee_ids(task))
+        return
+    if old == new:
+        return
+
+    old_count, old_completed = contribution(old)
+    new_count, new_completed = contribution(new)
+    if old[0] == new[0]:
+        apply_delta("owned", [new[0]], new_count - old_count, new_completed - old_completed)
+    else:
+        apply_delta("owned", [old[0]], -old_count, -old_completed)
+        apply_delta("owned", [new[0]], new_count, new_completed)
+
+    if not created and (old_count, old_completed) != (new_count, new_completed):
+        apply_delta("assigned", assignee_ids(task), new_count - old_count, new_completed - old_completed)
+
+
+def task_deleted(task, assignees):
+    count, completed = contribution(task_state(task))
+    apply_delta("owned", [task.owner_id], -count, -completed)
+    apply_delta("assigned", assignees, -count, -completed)
+
+
+def assignees_changed(instance, reverse, pk_set, sign):
+
+    if not reverse:
+        count, completed = contribution(task_state(instance))
+        apply_delta("assigned", pk_set, sign * count, sign * completed)
+        return
+
+    #user.tasks.add(...): pk_set holds task ids
+    totals = Task.all_objects.filter(pk__in=pk_set, is_deleted=False).aggregate(
+        count=Count("id"), completed=Count("id", filter=Q(is_completed=True))
+    )
+    apply_delta("assigned", [instance.pk], sign * totals["count"], sign * totals["completed"])
+
+
+def affected_users(task_ids):
+
+    #owners and assignees in one round trip
+    owners = Task.all_objects.filter(pk__in=task_ids).order_by().values_list("owner_id", flat=True)
+    assignees = Through.objects.filter(task_id__in=task_ids).order_by().values_list("user_id", flat=True)
+    return set(owners.union(assignees))
+
+
+def get_stats(user_id):
+    stats = TaskStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        reconcile_users([user_id])
+        stats = TaskStats.objects.get(user_id=user_id)
+    return stats
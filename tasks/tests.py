@@ -1,14 +1,41 @@
+from asgiref.sync import sync_to_async
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import csv
+import gzip
+import io
+import json
 import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
 from accounts.models import User
-from tasks.models import Task
+from backend import middleware, renderers
+from backend.renderers import FastJSONRenderer
+from backend.throttling import reset_buckets
+from tasks.cache import get_tasks_versions, version_key
+from tasks.changes import encode_token
+from tasks.filters import filter_tasks
+from tasks.models import StaleVersion, Task, TaskAssignment, TaskStats
+from tasks.pagination import ASSIGNED_KEYS, ordering
+from tasks.rendering import encode_rows, row_values
+from tasks.serializers import TaskReadSerializer
+from tasks.views import TaskDetailAPIView
+from tasks.stats import compute_stats
 from rbac.models import Role, Permission, RolePermission, UserRole
 
 
-class TaskAPITestCase(APITestCase):
+class TaskFixtureMixin:
 
+    #users, roles and one task each, shared by the task test cases without their test methods
     def setUp(self):
 
         #user-create admin+normal TEST
@@ -67,6 +94,7 @@ class TaskAPITestCase(APITestCase):
         )
 
         #logic
+        reset_buckets()
         self.admin_token = self.get_token("admin@test.com", "admin123")
         self.user_token = self.get_token("user@test.com", "user123")
 
@@ -81,7 +109,9 @@ class TaskAPITestCase(APITestCase):
     def auth(self, token):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
 
-    
+
+class TaskAPITestCase(TaskFixtureMixin, APITestCase):
+
     #tests = CRUD + RBAC
     def test_create_task(self):
         self.auth(self.user_token)
@@ -127,3 +157,890 @@ class TaskAPITestCase(APITestCase):
             format="json"
         )
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+    def test_cursor_pagination_walks_all_tasks(self):
+        for i in range(5):
+            Task.objects.create(title=f"Extra {i}", owner=self.user)
+        self.auth(self.user_token)
+
+        seen = []
+        res = self.client.get("/api/tasks/task/", {"pagination": "cursor", "limit": 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn("total", res.data)
+            seen.extend(t["task_id"] for t in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get("/api/tasks/task/", {"cursor": res.data["next"], "limit": 2})
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+        prev = self.client.get("/api/tasks/task/", {"cursor": res.data["previous"], "limit": 2})
+        self.assertEqual(len(prev.data["results"]), 2)
+        self.assertEqual([t["task_id"] for t in prev.data["results"]], seen[2:4])
+
+
+    def test_cursor_pagination_optional_total(self):
+        self.auth(self.admin_token)
+
+        res = self.client.get("/api/tasks/task/", {"pagination": "cursor", "count": "exact"})
+        self.assertEqual(res.data["total"], 2)
+
+        res = self.client.get("/api/tasks/task/", {"cursor": "not-a-cursor"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskQueryBudgetTestCase(TaskFixtureMixin, APITestCase):
+
+    #queries per request, must not grow with page size
+    QUERY_BUDGET = {
+        "list": 5,
+        "detail": 4,
+    }
+
+    def assertWithinBudget(self, endpoint, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params or {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(
+            len(ctx.captured_queries), self.QUERY_BUDGET[endpoint],
+            "\n".join(q["sql"] for q in ctx.captured_queries)
+        )
+        return res
+
+    def add_tasks(self, count):
+        assignees = [
+            User.objects.create_user(email=f"assignee{i}@test.com", username=f"assignee{i}", password="x")
+            for i in range(3)
+        ]
+        for i in range(count):
+            task = Task.objects.create(title=f"Bulk {i}", owner=self.user)
+            task.assigned_users.set(assignees)
+
+    def test_list_query_budget(self):
+        self.add_tasks(20)
+        self.auth(self.admin_token)
+
+        res = self.assertWithinBudget("list", "/api/tasks/task/", {"limit": 20})
+        self.assertEqual(len(res.data["results"][0]["assigned_users"]), 3)
+        self.assertWithinBudget("list", "/api/tasks/task/", {"pagination": "cursor", "limit": 20})
+
+    def test_detail_query_budget(self):
+        self.add_tasks(1)
+        task = Task.objects.filter(title="Bulk 0").get()
+        self.auth(self.user_token)
+
+        res = self.assertWithinBudget("detail", f"/api/tasks/{task.task_id}/")
+        self.assertEqual(res.data["owner"], "user@test.com")
+
+
+class TaskSearchTestCase(TaskFixtureMixin, APITestCase):
+
+    def search(self, text, **params):
+        return self.client.get("/api/tasks/task/", {"search": text, **params}).data["results"]
+
+    def test_search_prefix_and_all_terms(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title="Quarterly report", description="finance numbers", owner=self.admin)
+        self.auth(self.admin_token)
+
+        self.assertEqual([t["title"] for t in self.search("quart")], ["Quarterly report"])
+        self.assertEqual([t["title"] for t in self.search("report fin")], ["Quarterly report"])
+        self.assertEqual(self.search("report marketing"), [])
+
+    def test_search_ranks_title_matches_first(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title="Deploy", description="after the invoice run", owner=self.admin)
+            Task.objects.create(title="Invoice run", description="monthly", owner=self.admin)
+        self.auth(self.admin_token)
+
+        titles = [t["title"] for t in self.search("invoice")]
+        self.assertEqual(titles, ["Invoice run", "Deploy"])
+
+    def test_search_sees_updates(self):
+        self.auth(self.user_token)
+        self.assertEqual(len(self.search("user")), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/tasks/{self.user_task.task_id}/", {"title": "Renamed"}, format="json")
+        self.assertEqual([t["title"] for t in self.search("renamed")], ["Renamed"])
+
+    def test_rolled_back_writes_stay_out_of_search(self):
+        self.auth(self.user_token)
+        self.assertEqual(len(self.search("user")), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.user_task.title = "Phantom"
+                self.user_task.save()
+                transaction.set_rollback(True)
+        self.assertEqual(self.search("phantom"), [])
+
+
+class TaskBulkAPITestCase(TaskFixtureMixin, APITestCase):
+
+    url = "/api/tasks/task/bulk/"
+
+    def test_bulk_create_reports_per_item(self):
+        self.auth(self.user_token)
+
+        res = self.client.post(self.url, {"tasks": [
+            {"title": "One", "assigned_users": ["admin@test.com"]},
+            {"description": "missing title"},
+            {"title": "Two", "assigned_users": ["nobody@test.com"]},
+            {"title": "Three"},
+        ]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        statuses = [r["status"] for r in res.data["results"]]
+        self.assertEqual(statuses, ["created", "error", "error", "created"])
+        self.assertEqual(res.data["results"][0]["task"]["assigned_users"], ["admin@test.com"])
+        self.assertEqual(res.data["results"][0]["task"]["owner"], "user@test.com")
+
+        codes = {r["task"]["task_id"] for r in res.data["results"] if r["status"] == "created"}
+        self.assertEqual(Task.objects.filter(task_id__in=codes).count(), 2)
+
+    def test_bulk_create_query_count_is_flat(self):
+        self.auth(self.user_token)
+        items = [{"title": f"Task {i}", "assigned_users": ["admin@test.com", "user@test.com"]} for i in range(50)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(self.url, {"tasks": items}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        #two of them read and write the TaskAssignment projection
+        self.assertLess(len(ctx.captured_queries), 22)
+        self.assertEqual(Task.assigned_users.through.objects.count(), 100)
+
+    def test_bulk_update_and_delete(self):
+        self.auth(self.admin_token)
+        self.user_task.assigned_users.add(self.user)
+
+        res = self.client.patch(self.url, {"tasks": [
+            {"task_id": self.user_task.task_id, "is_completed": True, "assigned_users": ["admin@test.com"]},
+            {"task_id": "TK-missing", "title": "x"},
+        ]}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+
+        self.user_task.refresh_from_db()
+        self.assertTrue(self.user_task.is_completed)
+        self.assertEqual([u.email for u in self.user_task.assigned_users.all()], ["admin@test.com"])
+
+        res = self.client.delete(self.url, {"task_ids": [self.user_task.task_id, self.admin_task.task_id]}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Task.objects.count(), 0)
+
+    def test_bulk_update_is_scoped_to_owner(self):
+        self.auth(self.user_token)
+
+        res = self.client.patch(self.url, [{"task_id": self.admin_task.task_id, "title": "Hijack"}], format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.admin_task.refresh_from_db()
+        self.assertEqual(self.admin_task.title, "Admin Task")
+
+
+class TaskResponseCacheTestCase(TaskFixtureMixin, APITestCase):
+
+    def task_queries(self, url, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, **headers)
+        return res, [q for q in ctx.captured_queries if "tasks_task" in q["sql"]]
+
+    def test_repeated_list_served_from_cache(self):
+        self.auth(self.user_token)
+        first, queries = self.task_queries("/api/tasks/task/?limit=5")
+        self.assertTrue(queries)
+
+        second, queries = self.task_queries("/api/tasks/task/?limit=5")
+        self.assertEqual(queries, [])
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_if_none_match_returns_304(self):
+        self.auth(self.user_token)
+        url = f"/api/tasks/{self.user_task.task_id}/"
+        etag = self.client.get(url)["ETag"]
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, {"title": "Changed"}, format="json")
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["title"], "Changed")
+
+    def test_assignment_and_delete_invalidate(self):
+        self.auth(self.admin_token)
+        url = "/api/tasks/task/"
+        self.client.get(url)
+
+        self.user_task.assigned_users.add(self.admin)
+        data = self.client.get(url).data["results"]
+        self.assertIn(["admin@test.com"], [t["assigned_users"] for t in data])
+
+        self.admin_task.delete()
+        self.assertEqual(self.client.get(url).data["total"], 1)
+
+    def test_writes_retire_only_their_owner_and_admins(self):
+        self.auth(self.user_token)
+        self.task_queries("/api/tasks/task/")
+        self.auth(self.admin_token)
+        self.task_queries("/api/tasks/task/")
+
+        self.admin_task.title = "Renamed"
+        self.admin_task.save()
+
+        res, queries = self.task_queries("/api/tasks/task/")
+        self.assertTrue(queries)
+        self.assertIn("Renamed", [t["title"] for t in res.data["results"]])
+        self.auth(self.user_token)
+        self.assertEqual(self.task_queries("/api/tasks/task/")[1], [])
+
+    def test_version_bumped_again_on_commit(self):
+        key = version_key(self.user.pk)
+        before = get_tasks_versions(key)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_task.title = "Changed"
+            self.user_task.save()
+            self.assertEqual(get_tasks_versions(key)[0], before + 1)
+        self.assertEqual(get_tasks_versions(key)[0], before + 2)
+
+    def test_rbac_change_invalidates(self):
+        self.auth(self.admin_token)
+        self.assertEqual(self.client.get("/api/tasks/task/").data["total"], 2)
+
+        RolePermission.objects.filter(role=self.admin_role, permission__code="task.admin").delete()
+        self.assertEqual(self.client.get("/api/tasks/task/").data["total"], 1)
+
+
+class TaskAsyncAPITestCase(TaskFixtureMixin, APITestCase):
+
+    def headers(self, token):
+        return {"Authorization": f"Bearer {token}"}
+
+    async def test_async_list_matches_sync_scoping(self):
+        res = await self.async_client.get("/api/async/tasks/task/", headers=self.headers(self.user_token))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["total"], 1)
+
+        res = await self.async_client.get("/api/async/tasks/task/", headers=self.headers(self.admin_token))
+        self.assertEqual(res.json()["total"], 2)
+
+    async def test_async_cursor_pagination(self):
+        res = await self.async_client.get(
+            "/api/async/tasks/task/?pagination=cursor&limit=1&count=exact",
+            headers=self.headers(self.admin_token)
+        )
+        data = res.json()
+        self.assertEqual(len(data["results"]), 1)
+        self.assertEqual(data["total"], 2)
+
+        res = await self.async_client.get(
+            f"/api/async/tasks/task/?cursor={data['next']}&limit=1",
+            headers=self.headers(self.admin_token)
+        )
+        self.assertEqual(res.json()["results"][0]["task_id"], self.admin_task.task_id)
+
+    async def test_async_create_and_detail(self):
+        res = await self.async_client.post(
+            "/api/async/tasks/task/",
+            {"title": "Async Task", "assigned_users": ["admin@test.com"]},
+            content_type="application/json",
+            headers=self.headers(self.user_token)
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json()["assigned_users"], ["admin@test.com"])
+
+        res = await self.async_client.get(
+            f"/api/async/tasks/{res.json()['task_id']}/", headers=self.headers(self.user_token)
+        )
+        self.assertEqual(res.json()["title"], "Async Task")
+
+    async def test_async_requires_auth_and_scope(self):
+        res = await self.async_client.get("/api/async/tasks/task/")
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        res = await self.async_client.get(
+            f"/api/async/tasks/{self.admin_task.task_id}/", headers=self.headers(self.user_token)
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_async_post_with_bearer_skips_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        for url in ("/api/tasks/task/", "/api/async/tasks/task/"):
+            res = client.post(
+                url, {"title": "No cookie"}, content_type="application/json", headers=self.headers(self.user_token)
+            )
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    async def test_async_invalid_token_matches_sync(self):
+        headers = self.headers("not-a-token")
+        sync = await sync_to_async(self.client.get)("/api/tasks/task/", headers=headers)
+        res = await self.async_client.get("/api/async/tasks/task/", headers=headers)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.json(), sync.json())
+        self.assertEqual(res.json()["code"], "token_not_valid")
+        self.assertEqual(res["WWW-Authenticate"], sync["WWW-Authenticate"])
+
+
+class TaskExportTestCase(TaskFixtureMixin, APITestCase):
+
+    def read_ndjson(self, res):
+        body = b"".join(res.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_export_ndjson_scoped_to_user(self):
+        self.auth(self.user_token)
+        res = self.client.get("/api/tasks/task/export/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+
+        rows = self.read_ndjson(res)
+        self.assertEqual([row["task_id"] for row in rows], [self.user_task.task_id])
+
+    def test_export_csv_with_filters(self):
+        self.admin_task.assigned_users.add(self.user, self.admin)
+        self.user_task.is_completed = True
+        self.user_task.save()
+
+        self.auth(self.admin_token)
+        res = self.client.get("/api/tasks/task/export/?output=csv&is_completed=false")
+        rows = list(csv.DictReader(io.StringIO(b"".join(res.streaming_content).decode())))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["task_id"], self.admin_task.task_id)
+        self.assertEqual(sorted(rows[0]["assigned_users"].split(";")), ["admin@test.com", "user@test.com"])
+
+    @override_settings(TASKS_EXPORT_CHUNK_SIZE=2)
+    def test_export_batches_assignee_queries(self):
+        for i in range(4):
+            task = Task.objects.create(title=f"Export {i}", owner=self.admin)
+            task.assigned_users.add(self.user)
+
+        self.auth(self.admin_token)
+        res = self.client.get("/api/tasks/task/export/")
+        with CaptureQueriesContext(connection) as ctx:
+            rows = self.read_ndjson(res)
+
+        self.assertEqual(len(rows), 6)
+        #one task fetch and one assignee fetch per chunk of 2
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+
+    def test_export_rejects_unknown_output(self):
+        self.auth(self.admin_token)
+        res = self.client.get("/api/tasks/task/export/?output=xml")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskStatsTestCase(TaskFixtureMixin, APITestCase):
+
+    def assertStats(self, user, owned, owned_completed, assigned, assigned_completed):
+        expected = dict(
+            owned=owned, owned_completed=owned_completed,
+            assigned=assigned, assigned_completed=assigned_completed
+        )
+        stored = TaskStats.objects.filter(user=user).values(*TaskStats.COUNTERS).first()
+        self.assertEqual(stored, expected)
+        self.assertEqual(compute_stats([user.pk])[user.pk], expected)
+
+    def test_counters_follow_single_writes(self):
+        self.auth(self.user_token)
+        res = self.client.post("/api/tasks/task/", {
+            "title": "Shared", "assigned_users": ["admin@test.com", "user@test.com"]
+        }, format="json")
+        task = Task.objects.get(task_id=res.data["task_id"])
+        self.assertStats(self.user, 2, 0, 1, 0)
+        self.assertStats(self.admin, 1, 0, 1, 0)
+
+        self.client.patch(f"/api/tasks/{task.task_id}/", {"is_completed": True}, format="json")
+        self.assertStats(self.user, 2, 1, 1, 1)
+        self.assertStats(self.admin, 1, 0, 1, 1)
+
+        task = Task.objects.get(pk=task.pk)
+        task.delete()
+        self.assertStats(self.user, 1, 0, 0, 0)
+        task.restore()
+        self.assertStats(self.user, 2, 1, 1, 1)
+
+        task.assigned_users.remove(self.admin)
+        self.assertStats(self.admin, 1, 0, 0, 0)
+        self.admin.tasks.add(task, self.user_task)
+        self.assertStats(self.admin, 1, 0, 2, 1)
+        task.assigned_users.clear()
+        self.assertStats(self.admin, 1, 0, 1, 0)
+
+        Task.objects.get(pk=self.user_task.pk).hard_delete()
+        self.assertStats(self.user, 1, 1, 0, 0)
+        self.assertStats(self.admin, 1, 0, 0, 0)
+
+    def test_counters_follow_bulk_writes(self):
+        self.auth(self.admin_token)
+        url = "/api/tasks/task/bulk/"
+        self.client.post(url, {"tasks": [
+            {"title": "One", "assigned_users": ["user@test.com"]},
+            {"title": "Two", "assigned_users": ["user@test.com"]},
+        ]}, format="json")
+        self.assertStats(self.user, 1, 0, 2, 0)
+
+        one = Task.objects.get(title="One")
+        self.client.patch(url, {"tasks": [
+            {"task_id": one.task_id, "is_completed": True, "assigned_users": ["admin@test.com"]},
+        ]}, format="json")
+        self.assertStats(self.user, 1, 0, 1, 0)
+        self.assertStats(self.admin, 3, 1, 1, 1)
+
+        self.client.delete(url, {"task_ids": [one.task_id]}, format="json")
+        self.assertStats(self.admin, 2, 0, 0, 0)
+
+    def test_summary_endpoint(self):
+        self.admin_task.assigned_users.add(self.user)
+
+        self.auth(self.user_token)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get("/api/tasks/summary/")
+        self.assertEqual(res.data["owned"], {"total": 1, "completed": 0, "open": 1})
+        self.assertEqual(res.data["assigned"], {"total": 1, "completed": 0, "open": 1})
+        self.assertEqual(len([q for q in ctx.captured_queries if "tasks_taskstats" in q["sql"]]), 1)
+
+        res = self.client.get(f"/api/tasks/summary/?user_id={self.admin.user_id}")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.auth(self.admin_token)
+        res = self.client.get(f"/api/tasks/summary/?user_id={self.user.user_id}")
+        self.assertEqual(res.data["user_id"], self.user.user_id)
+
+    def test_reconcile_command_fixes_drift(self):
+        TaskStats.objects.filter(user=self.user).update(owned=40)
+
+        out = StringIO()
+        call_command("reconcile_task_stats", "--check", stdout=out)
+        self.assertIn("1 users drifted", out.getvalue())
+        self.assertEqual(TaskStats.objects.get(user=self.user).owned, 40)
+
+        call_command("reconcile_task_stats", stdout=StringIO())
+        self.assertStats(self.user, 1, 0, 0, 0)
+
+
+@override_settings(TASKS_CHANGES_SETTLE_SECONDS=0)
+class TaskChangesTestCase(TaskFixtureMixin, APITestCase):
+
+    url = "/api/tasks/changes/"
+
+    def sync(self, since=None, **params):
+        if since:
+            params["since"] = since
+        res = self.client.get(self.url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_initial_sync_then_incremental(self):
+        self.auth(self.admin_token)
+        data = self.sync(limit=1)
+        self.assertEqual([c["task_id"] for c in data["changes"]], [self.admin_task.task_id])
+        self.assertTrue(data["has_more"])
+
+        data = self.sync(data["since"], limit=1)
+        self.assertEqual([c["task_id"] for c in data["changes"]], [self.user_task.task_id])
+
+        since = self.sync(data["since"])["since"]
+        self.assertEqual(self.sync(since)["changes"], [])
+
+        self.client.patch(f"/api/tasks/{self.user_task.task_id}/", {"title": "Renamed"}, format="json")
+        changes = self.sync(since)["changes"]
+        self.assertEqual([(c["task_id"], c["title"]) for c in changes], [(self.user_task.task_id, "Renamed")])
+
+    def test_tombstones_restores_and_assignments(self):
+        self.auth(self.user_token)
+        since = self.sync()["since"]
+
+        Task.objects.get(pk=self.user_task.pk).delete()
+        changes = self.sync(since)["changes"]
+        self.assertEqual(changes[0]["task_id"], self.user_task.task_id)
+        self.assertTrue(changes[0]["deleted"])
+        since = self.sync(since)["since"]
+
+        Task.all_objects.get(pk=self.user_task.pk).restore()
+        changes = self.sync(since)["changes"]
+        self.assertFalse(changes[0]["deleted"])
+        since = self.sync(since)["since"]
+
+        self.user_task.assigned_users.add(self.admin)
+        self.assertEqual(self.sync(since)["changes"][0]["assigned_users"], ["admin@test.com"])
+
+    def test_bulk_delete_shows_up(self):
+        self.auth(self.admin_token)
+        since = self.sync()["since"]
+        self.client.delete("/api/tasks/task/bulk/", {"task_ids": [self.admin_task.task_id]}, format="json")
+        self.assertEqual([c["deleted"] for c in self.sync(since)["changes"]], [True])
+
+    def test_feed_is_scoped_and_validates_token(self):
+        self.auth(self.user_token)
+        self.assertEqual([c["task_id"] for c in self.sync()["changes"]], [self.user_task.task_id])
+
+        res = self.client.get(self.url, {"since": "garbage"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        old = encode_token(timezone.now() - timedelta(days=365), 1)
+        res = self.client.get(self.url, {"since": old})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+    def test_quiet_feed_advances_its_token(self):
+        self.auth(self.user_token)
+        self.sync()
+        aging = encode_token(timezone.now() - timedelta(days=80), 0)
+        Task.objects.filter(pk=self.user_task.pk).update(updated_at=timezone.now() - timedelta(days=85))
+
+        data = self.sync(aging)
+        self.assertEqual(data["changes"], [])
+        self.assertNotEqual(data["since"], aging)
+
+        #still valid after the old watermark would have expired
+        with mock.patch("tasks.changes.timezone.now", return_value=timezone.now() + timedelta(days=30)):
+            self.assertEqual(self.sync(data["since"])["changes"], [])
+
+
+class TaskAssigneeWriteTestCase(TaskFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.members = User.objects.bulk_create([
+            User(email=f"member{i}@test.com", username=f"member{i}", user_id=f"USRM{i}") for i in range(60)
+        ])
+        self.emails = [user.email for user in self.members]
+        self.url = f"/api/tasks/{self.user_task.task_id}/"
+        self.auth(self.user_token)
+
+    def through_writes(self, ctx):
+        return [
+            q for q in ctx.captured_queries
+            if "tasks_task_assigned_users" in q["sql"] and q["sql"].startswith(("INSERT", "DELETE"))
+        ]
+
+    def test_create_resolves_assignees_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post("/api/tasks/task/", {"title": "Team", "assigned_users": self.emails}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(res.data["assigned_users"]), sorted(self.emails))
+        self.assertLessEqual(len(ctx.captured_queries), 20)
+        self.assertEqual(len(self.through_writes(ctx)), 1)
+
+    def test_patch_writes_only_the_difference(self):
+        self.user_task.assigned_users.add(*self.members[:50])
+
+        wanted = self.emails[10:60]
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(self.url, {"assigned_users": wanted}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data["assigned_users"]), sorted(wanted))
+        #two of them delete and insert the matching TaskAssignment rows
+        self.assertLessEqual(len(ctx.captured_queries), 22)
+        #one bulk delete of 10 rows, one bulk insert of 10
+        self.assertEqual(len(self.through_writes(ctx)), 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch(self.url, {"assigned_users": wanted}, format="json")
+        self.assertEqual(self.through_writes(ctx), [])
+
+    def test_unknown_emails_rejected_together(self):
+        res = self.client.patch(self.url, {
+            "assigned_users": ["admin@test.com", "ghost1@test.com", "ghost2@test.com"]
+        }, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["assigned_users"], ["Unknown user: ghost1@test.com", "Unknown user: ghost2@test.com"])
+        self.assertFalse(self.user_task.assigned_users.exists())
+
+
+class TaskRenderingTestCase(TaskFixtureMixin, APITestCase):
+
+    def seed(self):
+        self.user_task.assigned_users.add(self.admin, self.user)
+        for n in range(30):
+            Task.objects.create(title=f"Task {n}", description="x" * 100, owner=self.user)
+        self.auth(self.user_token)
+
+    def test_rows_match_serializer(self):
+        self.seed()
+        tasks = Task.objects.for_read().order_by("id")
+        rows = list(row_values(Task.objects.all()).order_by("id"))
+        self.assertEqual(encode_rows(rows), list(TaskReadSerializer(tasks, many=True).data))
+
+    def test_fast_renderer_matches_drf(self):
+        self.seed()
+        data = {"task": TaskReadSerializer(Task.objects.for_read().get(pk=self.user_task.pk)).data, "text": "ü \u2028"}
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_large_list_gzipped(self):
+        self.seed()
+        url = "/api/tasks/task/?limit=31"
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))["results"]), 31)
+        self.assertTrue(res["ETag"].startswith('W/"'))
+
+        #the weak ETag the client got back still matches
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_small_responses_left_alone(self):
+        self.seed()
+        res = self.client.get(f"/api/tasks/{self.user_task.task_id}/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertEqual(res.data["assigned_users"], ["admin@test.com", "user@test.com"])
+
+    @skipUnless(middleware.brotli, "brotli not installed")
+    def test_brotli_preferred(self):
+        self.seed()
+        res = self.client.get("/api/tasks/task/?limit=31", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(res["Content-Encoding"], "br")
+        self.assertEqual(len(json.loads(middleware.brotli.decompress(res.content))["results"]), 31)
+
+    def test_refused_codings_respected(self):
+        self.seed()
+        res = self.client.get("/api/tasks/task/?limit=31", HTTP_ACCEPT_ENCODING="br;q=0, gzip;q=0.5")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+
+        res = self.client.get("/api/tasks/task/?limit=31", HTTP_ACCEPT_ENCODING="gzip;q=0, br;q=0")
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertEqual(len(res.data["results"]), 31)
+
+        self.assertEqual(
+            middleware.accepted_encodings("gzip;q=0.8, BR ; q=0, *;q=0.1"), {"gzip": 0.8, "br": 0.0, "*": 0.1}
+        )
+
+    @override_settings(COMPRESS_MIN_BYTES=0)
+    def test_token_responses_never_brotli(self):
+        with mock.patch.object(middleware, "brotli") as fake_brotli:
+            res = self.client.post(
+                "/api/auth/token/", {"email": "user@test.com", "password": "user123"},
+                format="json", HTTP_ACCEPT_ENCODING="br, gzip"
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn("access", json.loads(gzip.decompress(res.content)))
+        fake_brotli.compress.assert_not_called()
+
+    def test_export_stream_gzipped(self):
+        self.seed()
+        res = self.client.get("/api/tasks/task/export/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(res.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 31)
+
+
+class TaskConcurrencyTestCase(TaskFixtureMixin, APITestCase):
+
+    def detail(self):
+        return self.client.get(f"/api/tasks/{self.user_task.task_id}/")
+
+    def test_patch_with_stale_etag_rejected(self):
+        self.auth(self.user_token)
+        url = f"/api/tasks/{self.user_task.task_id}/"
+        etag = self.detail()["ETag"]
+        self.assertTrue(etag.startswith('"v1-'))
+
+        res = self.client.patch(url, {"title": "First"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res["ETag"].startswith('"v2-'))
+
+        res = self.client.patch(url, {"title": "Second"}, format="json", HTTP_IF_MATCH=f"W/{etag}")
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(Task.objects.get(pk=self.user_task.pk).title, "First")
+
+        res = self.client.patch(url, {"title": "Third"}, format="json", HTTP_IF_MATCH="*")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_patch_writes_changed_columns_conditionally(self):
+        self.auth(self.user_token)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                f"/api/tasks/{self.user_task.task_id}/",
+                {"title": "Renamed", "description": "User description"}, format="json"
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "tasks_task"')]
+        self.assertEqual(len(updates), 1)
+        columns, _, where = updates[0].partition("WHERE")
+        self.assertIn('"title"', columns)
+        self.assertNotIn('"description"', columns)
+        self.assertIn('"version"', where)
+
+        #nothing changed, nothing written
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch(f"/api/tasks/{self.user_task.task_id}/", {"title": "Renamed"}, format="json")
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "tasks_task"')])
+
+    def test_patch_without_if_match_retries_on_conflict(self):
+        self.auth(self.user_token)
+        get_object = TaskDetailAPIView.get_object
+        calls = []
+
+        def racing_get_object(view, *args):
+            task = get_object(view, *args)
+            if not calls:
+                #another write between our read and our update. it shares the attempt's
+                #savepoint here, so it rolls back with it, unlike a real second client
+                Task.objects.filter(pk=task.pk).update(version=F("version") + 1)
+            calls.append(task)
+            return task
+
+        with mock.patch.object(TaskDetailAPIView, "get_object", racing_get_object):
+            res = self.client.patch(f"/api/tasks/{self.user_task.task_id}/", {"title": "Mine"}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(calls), 2)
+        task = Task.objects.get(pk=self.user_task.pk)
+        self.assertEqual((task.title, task.version), ("Mine", 2))
+
+    def test_stale_instance_save_raises(self):
+        first = Task.objects.get(pk=self.user_task.pk)
+        second = Task.objects.get(pk=self.user_task.pk)
+        first.title = "First"
+        first.save(update_fields=["title"], expected_version=first.version)
+        self.assertEqual(first.version, 2)
+
+        second.title = "Second"
+        with self.assertRaises(StaleVersion), transaction.atomic():
+            second.save(update_fields=["title"], expected_version=second.version)
+        self.assertEqual(second.version, 1)
+        self.assertEqual(Task.objects.get(pk=self.user_task.pk).title, "First")
+
+    def test_unconditional_save_only_moves_forward(self):
+        stale = Task.objects.get(pk=self.user_task.pk)
+        Task.objects.filter(pk=stale.pk).update(version=5)
+
+        stale.title = "Stale"
+        stale.save(update_fields=["title"])
+        self.assertEqual(stale.version, 6)
+        self.assertEqual(Task.objects.get(pk=stale.pk).version, 6)
+
+        #an empty update_fields still writes nothing
+        with self.assertNumQueries(0):
+            stale.save(update_fields=[])
+
+    def test_delete_with_stale_etag_rejected(self):
+        self.auth(self.admin_token)
+        url = f"/api/tasks/{self.user_task.task_id}/"
+        etag = self.client.get(url)["ETag"]
+        self.user_task.assigned_users.add(self.admin)
+
+        res = self.client.delete(url, HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertFalse(Task.objects.get(pk=self.user_task.pk).is_deleted)
+
+        res = self.client.delete(url, HTTP_IF_MATCH=self.client.get(url)["ETag"])
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_every_write_path_bumps_version(self):
+        self.auth(self.admin_token)
+        self.user_task.assigned_users.add(self.admin)
+        self.assertEqual(self.user_task.version, 2)
+
+        self.client.patch("/api/tasks/task/bulk/", {"tasks": [
+            {"task_id": self.user_task.task_id, "is_completed": True}
+        ]}, format="json")
+        self.assertEqual(Task.objects.get(pk=self.user_task.pk).version, 3)
+
+        self.client.delete("/api/tasks/task/bulk/", {"task_ids": [self.user_task.task_id]}, format="json")
+        self.assertEqual(Task.all_objects.get(pk=self.user_task.pk).version, 4)
+
+
+class TaskAssignmentTestCase(TaskFixtureMixin, APITestCase):
+
+    def rows(self, **filters):
+        return set(TaskAssignment.objects.filter(**filters).values_list("task_id", "user_id", "is_deleted"))
+
+    def test_projection_follows_assignee_changes(self):
+        task = self.user_task
+        task.assigned_users.add(self.admin, self.user)
+        self.assertEqual(self.rows(), {(task.pk, self.admin.pk, False), (task.pk, self.user.pk, False)})
+
+        task.assigned_users.remove(self.admin)
+        self.assertEqual(self.rows(), {(task.pk, self.user.pk, False)})
+
+        self.admin.tasks.add(task, self.admin_task)
+        self.assertEqual(self.rows(user=self.admin), {(task.pk, self.admin.pk, False), (self.admin_task.pk, self.admin.pk, False)})
+
+        self.admin.tasks.clear()
+        task.delete()
+        self.assertEqual(self.rows(), {(task.pk, self.user.pk, True)})
+
+        task.restore()
+        task.assigned_users.clear()
+        self.assertEqual(self.rows(), set())
+
+    def test_projection_follows_bulk_writes(self):
+        self.auth(self.admin_token)
+        res = self.client.post("/api/tasks/task/bulk/", {"tasks": [
+            {"title": "Bulk", "assigned_users": ["user@test.com"]}
+        ]}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        task = Task.objects.get(title="Bulk")
+        self.assertEqual(self.rows(), {(task.pk, self.user.pk, False)})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.delete("/api/tasks/task/bulk/", {"task_ids": [task.task_id]}, format="json")
+        self.assertEqual(self.rows(), {(task.pk, self.user.pk, True)})
+        writes = [q["sql"] for q in ctx.captured_queries if "tasks_taskassignment" in q["sql"]]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith("UPDATE"))
+
+    def test_assigned_filter_skips_distinct(self):
+        self.user_task.assigned_users.add(self.admin, self.user)
+        self.admin_task.assigned_users.add(self.user)
+        self.auth(self.admin_token)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get("/api/tasks/task/", {"assigned_user": "user@test.com"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertFalse([q for q in ctx.captured_queries if "DISTINCT" in q["sql"]])
+
+        self.admin_task.delete()
+        res = self.client.get("/api/tasks/task/", {"assigned_user": "user@test.com"})
+        self.assertEqual([t["task_id"] for t in res.data["results"]], [self.user_task.task_id])
+
+    def test_assigned_cursor_pages_follow_the_projection(self):
+        for i in range(4):
+            Task.objects.create(title=f"Assigned {i}", owner=self.admin).assigned_users.add(self.user)
+        self.user_task.assigned_users.add(self.user)
+        self.auth(self.admin_token)
+
+        seen = []
+        params = {"assigned_user": "user@test.com", "pagination": "cursor", "limit": 2}
+        res = self.client.get("/api/tasks/task/", params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(t["task_id"] for t in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get("/api/tasks/task/", {**params, "cursor": res.data["next"]})
+
+        expected = TaskAssignment.objects.filter(user=self.user).order_by("-created_at", "-task")
+        self.assertEqual(seen, [str(task_id) for task_id in expected.values_list("task__task_id", flat=True)])
+
+        prev = self.client.get("/api/tasks/task/", {**params, "cursor": res.data["previous"]})
+        self.assertEqual([t["task_id"] for t in prev.data["results"]], seen[2:4])
+
+    @skipUnless(connection.vendor == "sqlite", "sqlite plan")
+    def test_assigned_list_reads_the_index_in_order(self):
+        queryset = filter_tasks(Task.objects.all(), {"assigned_user": "user@test.com"})
+        plan = queryset.order_by(*ordering(ASSIGNED_KEYS))[:10].explain()
+        self.assertIn("task_assignment_user_idx (user_id=? AND is_deleted=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_reconcile_command_repairs_drift(self):
+        self.user_task.assigned_users.add(self.admin, self.user)
+        TaskAssignment.objects.filter(user=self.admin).delete()
+        TaskAssignment.objects.create(user=self.admin, task=self.admin_task, created_at=timezone.now())
+
+        out = StringIO()
+        call_command("reconcile_task_assignments", "--check", stdout=out)
+        self.assertIn(f"task {self.user_task.pk}: missing users [{self.admin.pk}]", out.getvalue())
+        self.assertIn("2 tasks drifted", out.getvalue())
+        self.assertEqual(TaskAssignment.objects.count(), 2)
+
+        call_command("reconcile_task_assignments", stdout=StringIO())
+        self.assertEqual(self.rows(), {(self.user_task.pk, self.admin.pk, False), (self.user_task.pk, self.user.pk, False)})
@@ -1,7 +1,11 @@
 from django.urls import path
-from .views import TaskCreateAPIView, TaskDetailAPIView
+from .views import TaskBulkAPIView, TaskChangesAPIView, TaskCreateAPIView, TaskDetailAPIView, TaskExportAPIView, TaskSummaryAPIView
 
 urlpatterns = [
     path("task/", TaskCreateAPIView.as_view(), name="task_create"),
+    path("task/bulk/", TaskBulkAPIView.as_view(), name="task_bulk"),
+    path("task/export/", TaskExportAPIView.as_view(), name="task_export"),
+    path("changes/", TaskChangesAPIView.as_view(), name="task_changes"),
+    path("summary/", TaskSummaryAPIView.as_view(), name="task_summary"),
     path("<str:task_id>/", TaskDetailAPIView.as_view(), name="task_detail"),
 ]
@@ -1,70 +1,92 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
 
-from tasks.models import Task
-from tasks.serializers import TaskSerializer
+from backend.metrics import timed
+from backend.routers import replica_reads
+from backend.tenancy import get_current_tenant, tenant_db
+from tasks.cache import LIST_PARAMS, cached_response, if_match_versions, task_etag
+from tasks.changes import ExpiredToken, InvalidToken, changes_since
+from tasks.export import CONTENT_TYPES, STREAMS, export_rows
+from tasks.filters import filter_tasks, list_keys
+from tasks.models import StaleVersion, Task
+from tasks.pagination import InvalidCursor, estimate_count, keyset_page, ordering
+from tasks.rendering import encode_rows, row_values
+from tasks.serializers import TaskReadSerializer, TaskSerializer
+from tasks.services import bulk_create_tasks, bulk_delete_tasks, bulk_update_tasks
+from tasks.stats import get_stats
+from accounts.models import User
 from rbac.services import user_has_permission
 
 
 class TaskCreateAPIView(APIView):
 
     def get_queryset(self, request):
+        queryset = Task.objects.for_read()
         if user_has_permission(request.user, "task.admin"):
-            return Task.objects.filter(is_deleted=False)
-        return Task.objects.filter(owner=request.user, is_deleted=False)
+            return queryset.filter(is_deleted=False)
+        return queryset.filter(owner=request.user, is_deleted=False)
 
     def get(self, request):
-        if not user_has_permission(request.user, "task.view"):
-            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
-
-        queryset = self.get_queryset(request)
+        with replica_reads():
+            if not user_has_permission(request.user, "task.view"):
+                return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-        #search
-        search = request.query_params.get("search")
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search)
-            )
+            return cached_response(request, "list", lambda: self.list_tasks(request), LIST_PARAMS)
 
-        #filters
-        is_completed = request.query_params.get("is_completed")
-        if is_completed in ["true", "false"]:
-            queryset = queryset.filter(is_completed=(is_completed == "true"))
+    def list_tasks(self, request):
+        queryset = filter_tasks(self.get_queryset(request), request.query_params)
 
-        assigned_user = request.query_params.get("assigned_user")
-        if assigned_user:
-            queryset = queryset.filter(assigned_users__email=assigned_user)
-
-        created_after = request.query_params.get("created_after")
-        if created_after:
-            queryset = queryset.filter(created_at__gte=created_after)
-
-        created_before = request.query_params.get("created_before")
-        if created_before:
-            queryset = queryset.filter(created_at__lte=created_before)
-
-        queryset = queryset.order_by("-created_at").distinct()
+        limit = int(request.query_params.get("limit", 10))
+        count = request.query_params.get("count")
+
+        #cursor pagination
+        cursor = request.query_params.get("cursor")
+        if cursor or request.query_params.get("pagination") == "cursor":
+            try:
+                results, next_cursor, prev_cursor = keyset_page(
+                    row_values(queryset), cursor, limit, list_keys(request.query_params)
+                )
+            except InvalidCursor:
+                return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+            with timed("serializer"):
+                serialized = encode_rows(results)
+
+            data = {
+                "limit": limit,
+                "next": next_cursor,
+                "previous": prev_cursor,
+                "results": serialized
+            }
+            if count == "exact":
+                data["total"] = queryset.count()
+            elif count == "approx":
+                data["total"] = estimate_count(queryset)
+            return Response(data)
 
         #pagination
         page = int(request.query_params.get("page", 1))
-        limit = int(request.query_params.get("limit", 10))
 
         start = (page - 1) * limit
         end = start + limit
 
-        total = queryset.count()
-        results = queryset[start:end]
+        total = estimate_count(queryset) if count == "approx" else queryset.count()
+        order = ordering(list_keys(request.query_params))
+        if request.query_params.get("search"):
+            order = ("-search_rank",) + order
+        results = list(row_values(queryset).order_by(*order)[start:end])
 
-        serializer = TaskSerializer(results, many=True)
+        with timed("serializer"):
+            serialized = encode_rows(results)
 
         return Response({
             "page": page,
             "limit": limit,
             "total": total,
-            "results": serializer.data
+            "results": serialized
         })
 
 
@@ -72,50 +94,177 @@ class TaskCreateAPIView(APIView):
         if not user_has_permission(request.user, "task.create"):
             return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-        serializer = TaskSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        with timed("serializer"):
+            serializer = TaskSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
 
         serializer.save(owner=request.user)
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        with timed("serializer"):
+            data = serializer.data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+
+class TaskExportAPIView(APIView):
+
+    def get(self, request):
+        if not user_has_permission(request.user, "task.view"):
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        #"format" is taken by drf content negotiation
+        output = request.query_params.get("output", "ndjson")
+        if output not in STREAMS:
+            return Response(
+                {"error": f"Unsupported output, use one of: {', '.join(STREAMS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = Task.objects.filter(is_deleted=False)
+        if not user_has_permission(request.user, "task.admin"):
+            queryset = queryset.filter(owner=request.user)
+        queryset = filter_tasks(queryset, request.query_params)
+
+        response = StreamingHttpResponse(
+            STREAMS[output](export_rows(queryset, keys=list_keys(request.query_params))),
+            content_type=CONTENT_TYPES[output]
+        )
+        response["Content-Disposition"] = f'attachment; filename="tasks.{output}"'
+        return response
+
+
+
+class TaskChangesAPIView(APIView):
+
+    def get(self, request):
+        if not user_has_permission(request.user, "task.view"):
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        #soft-deleted rows included, they come back as tombstones
+        queryset = Task.all_objects.for_read().filter(tenant=get_current_tenant())
+        if not user_has_permission(request.user, "task.admin"):
+            queryset = queryset.filter(owner=request.user)
+
+        limit = min(int(request.query_params.get("limit", 100)), 1000)
+        try:
+            with timed("serializer"):
+                changes, token, has_more = changes_since(queryset, request.query_params.get("since"), limit)
+        except InvalidToken as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredToken as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_410_GONE)
+
+        return Response({
+            "changes": changes,
+            "since": token,
+            "has_more": has_more
+        })
+
+
+
+class TaskSummaryAPIView(APIView):
+
+    def get(self, request):
+        if not user_has_permission(request.user, "task.view"):
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        user = request.user
+        user_id = request.query_params.get("user_id")
+        if user_id and user_id != user.user_id:
+            if not user_has_permission(request.user, "task.admin"):
+                return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+            user = User.objects.filter(user_id=user_id).first()
+            if user is None:
+                return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        #one row read, counters are kept up to date by tasks.stats
+        stats = get_stats(user.pk)
+        return Response({
+            "user_id": user.user_id,
+            "owned": {
+                "total": stats.owned,
+                "completed": stats.owned_completed,
+                "open": stats.owned - stats.owned_completed
+            },
+            "assigned": {
+                "total": stats.assigned,
+                "completed": stats.assigned_completed,
+                "open": stats.assigned - stats.assigned_completed
+            }
+        })
 
 
 
 class TaskDetailAPIView(APIView):
 
-    def get_object(self, request, task_id):
+    def get_object(self, request, task_id, queryset=None):
+        if queryset is None:
+            queryset = Task.objects.all()
         try:
             if user_has_permission(request.user, "task.admin"):
-                return Task.objects.get(task_id=task_id, is_deleted=False)
-            return Task.objects.get(task_id=task_id, owner=request.user, is_deleted=False)
+                return queryset.get(task_id=task_id, is_deleted=False)
+            return queryset.get(task_id=task_id, owner=request.user, is_deleted=False)
         except Task.DoesNotExist:
             return None
 
 
     def get(self, request, task_id):
-        if not user_has_permission(request.user, "task.view"):
-            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+        with replica_reads():
+            if not user_has_permission(request.user, "task.view"):
+                return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-        task = self.get_object(request, task_id)
-        if not task:
+            return cached_response(request, f"detail:{task_id}", lambda: self.retrieve(request, task_id))
+
+    def retrieve(self, request, task_id):
+        row = self.get_object(request, task_id, row_values(Task.objects.all()))
+        if not row:
             return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response(TaskSerializer(task).data)
+        with timed("serializer"):
+            data = encode_rows([row])[0]
+        return Response(data, headers={"ETag": task_etag(row.version, data)})
 
 
+    #PATCH retries this often when another write lands between its read and its
+    #update, requests carrying If-Match get a 412 instead
+    write_attempts = 3
+
+    def precondition_failed(self):
+        return Response(
+            {"error": "Task was modified, fetch it again and retry"},
+            status=status.HTTP_412_PRECONDITION_FAILED
+        )
+
     def patch(self, request, task_id):
         if not user_has_permission(request.user, "task.update"):
             return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-        task = self.get_object(request, task_id)
-        if not task:
-            return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
+        versions = if_match_versions(request)
+        for attempt in range(self.write_attempts):
+            try:
+                with transaction.atomic(using=tenant_db()):
+                    task = self.get_object(request, task_id, Task.objects.for_read())
+                    if not task:
+                        return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
+                    if versions not in (None, "*") and task.version not in versions:
+                        return self.precondition_failed()
 
-        serializer = TaskSerializer(task, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+                    with timed("serializer"):
+                        serializer = TaskSerializer(task, data=request.data, partial=True)
+                        serializer.is_valid(raise_exception=True)
 
-        return Response(serializer.data)
+                    #UPDATE ... WHERE version = the one just read, touching only changed columns
+                    serializer.save(expected_version=task.version)
+            except StaleVersion:
+                if versions is not None:
+                    return self.precondition_failed()
+                continue
+
+            with timed("serializer"):
+                data = serializer.data
+            return Response(data, headers={"ETag": task_etag(task.version, data)})
+
+        return self.precondition_failed()
 
 
     def delete(self, request, task_id):
@@ -126,5 +275,99 @@ class TaskDetailAPIView(APIView):
         if not task:
             return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        task.delete()
+        versions = if_match_versions(request)
+        if versions in (None, "*"):
+            task.delete()
+        elif task.version not in versions:
+            return self.precondition_failed()
+        else:
+            try:
+                with transaction.atomic(using=tenant_db()):
+                    task.delete(expected_version=task.version)
+            except StaleVersion:
+                return self.precondition_failed()
         return Response({"message": "Task deleted"}, status=status.HTTP_204_NO_CONTENT)
+
+
+
+class TaskBulkAPIView(APIView):
+
+    max_items = 500
+
+    def get_queryset(self, request):
+        if user_has_permission(request.user, "task.admin"):
+            return Task.objects.filter(is_deleted=False)
+        return Task.objects.filter(owner=request.user, is_deleted=False)
+
+    def get_items(self, request, key):
+        items = request.data.get(key) if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return None, Response({"error": f"Expected a non-empty list of {key}"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return None, Response({"error": f"At most {self.max_items} items per request"}, status=status.HTTP_400_BAD_REQUEST)
+        return items, None
+
+    def build_response(self, items, done, errors, done_status):
+        tasks = Task.objects.for_read().in_bulk([task.pk for task in done.values()])
+
+        results = []
+        for index in range(len(items)):
+            if index in done:
+                results.append({
+                    "index": index,
+                    "status": done_status,
+                    "task": TaskReadSerializer(tasks[done[index].pk]).data
+                })
+            else:
+                results.append({"index": index, "status": "error", "errors": errors[index]})
+
+        if not errors:
+            code = status.HTTP_201_CREATED if done_status == "created" else status.HTTP_200_OK
+        elif done:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({"results": results}, status=code)
+
+
+    def post(self, request):
+        if not user_has_permission(request.user, "task.create"):
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        items, error = self.get_items(request, "tasks")
+        if error:
+            return error
+
+        created, errors = bulk_create_tasks(request.user, items)
+        return self.build_response(items, created, errors, "created")
+
+
+    def patch(self, request):
+        if not user_has_permission(request.user, "task.update"):
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        items, error = self.get_items(request, "tasks")
+        if error:
+            return error
+
+        updated, errors = bulk_update_tasks(self.get_queryset(request), items)
+        return self.build_response(items, updated, errors, "updated")
+
+
+    def delete(self, request):
+        if not user_has_permission(request.user, "task.delete"):
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        task_ids, error = self.get_items(request, "task_ids")
+        if error:
+            return error
+
+        deleted, missing = bulk_delete_tasks(self.get_queryset(request), [str(task_id) for task_id in task_ids])
+
+        results = [{"task_id": task_id, "status": "deleted"} for task_id in deleted]
+        results += [{"task_id": task_id, "status": "error", "errors": {"task_id": ["Task not found"]}} for task_id in missing]
+
+        code = status.HTTP_207_MULTI_STATUS if missing and deleted else status.HTTP_200_OK
+        if not deleted:
+            code = status.HTTP_404_NOT_FOUND
+        return Response({"results": results}, status=code)